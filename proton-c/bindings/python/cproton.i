@@ -31,6 +31,7 @@
 #include <proton/ssl.h>
 #include <proton/reactor.h>
 #include <proton/handlers.h>
+#include <limits.h>
 
 /*
 NOTE: According to ccache-swig man page: "Known problems are using
@@ -103,13 +104,24 @@ PN_HANDLE(PNI_PYTRACER);
   if ($input == Py_None) {
     $1.start = NULL;
     $1.size = 0;
-  } else {
+  } else if (PyBytes_Check($input) || !PyObject_CheckBuffer($input)) {
     $1.start = PyBytes_AsString($input);
 
     if (!$1.start) {
       return NULL;
     }
     $1.size = PyBytes_Size($input);
+  } else {
+    // any other object supporting the buffer protocol, e.g. a
+    // bytearray or memoryview; the data stays valid for the call as
+    // the object is referenced by the argument tuple
+    Py_buffer view;
+    if (PyObject_GetBuffer($input, &view, PyBUF_SIMPLE) < 0) {
+      return NULL;
+    }
+    $1.start = (const char *) view.buf;
+    $1.size = view.len;
+    PyBuffer_Release(&view);
   }
 }
 
@@ -147,6 +159,27 @@ int pn_message_encode(pn_message_t *msg, char *BIN_OUT, size_t *BIN_SIZE);
 int pn_message_decode(pn_message_t *msg, const char *BIN_IN, size_t BIN_LEN);
 %ignore pn_message_decode;
 
+%pybuffer_mutable_binary(char *BIN_BUF, size_t BIN_BUF_LEN)
+
+// Encode into a caller supplied writable buffer, returning the encoded
+// size or PN_OVERFLOW if the buffer is too small, and compute the exact
+// encoded size of a message up front.
+%inline %{
+  int pn_message_encode_into(pn_message_t *msg, char *BIN_BUF, size_t BIN_BUF_LEN) {
+    size_t size = BIN_BUF_LEN;
+    int err = pn_message_encode(msg, BIN_BUF, &size);
+    return err ? err : (int) size;
+  }
+
+  int pn_message_encoded_size(pn_message_t *msg) {
+    pn_data_t *data = pn_data(16);
+    int err = pn_message_data(msg, data);
+    int size = err ? err : (int) pn_data_encoded_size(data);
+    pn_data_free(data);
+    return size;
+  }
+%}
+
 ssize_t pn_link_send(pn_link_t *transport, const char *BIN_IN, size_t BIN_LEN);
 %ignore pn_link_send;
 
@@ -164,6 +197,14 @@ ssize_t pn_link_send(pn_link_t *transport, const char *BIN_IN, size_t BIN_LEN);
 %}
 %ignore pn_link_recv;
 
+// Receive into a caller supplied writable buffer, returning the number
+// of bytes received, PN_EOS at the end of the delivery or an error.
+%inline %{
+  int pn_link_recv_into(pn_link_t *link, char *BIN_BUF, size_t BIN_BUF_LEN) {
+    return pn_link_recv(link, BIN_BUF, BIN_BUF_LEN);
+  }
+%}
+
 ssize_t pn_transport_push(pn_transport_t *transport, const char *BIN_IN, size_t BIN_LEN);
 %ignore pn_transport_push;
 
@@ -181,6 +222,30 @@ ssize_t pn_transport_push(pn_transport_t *transport, const char *BIN_IN, size_t
 %}
 %ignore pn_transport_peek;
 
+// Peek into a caller supplied writable buffer, and expose the pending
+// output of a transport as a read-only view without copying it. The
+// view refers to the output buffer of the transport directly, so it is
+// only valid until the next call that pops or generates output.
+%inline %{
+  int pn_transport_peek_into(pn_transport_t *transport, char *BIN_BUF, size_t BIN_BUF_LEN) {
+    return pn_transport_peek(transport, BIN_BUF, BIN_BUF_LEN);
+  }
+
+  PyObject *pn_transport_output_view(pn_transport_t *transport) {
+    PyObject *view;
+    ssize_t pending = pn_transport_pending(transport);
+    char *head = pending > 0 ? (char *) pn_transport_head(transport) : NULL;
+    SWIG_PYTHON_THREAD_BEGIN_BLOCK;
+#if PY_MAJOR_VERSION >= 3
+    view = PyMemoryView_FromMemory(head ? head : (char *) "", head ? pending : 0, PyBUF_READ);
+#else
+    view = PyBuffer_FromMemory(head ? head : (char *) "", head ? pending : 0);
+#endif
+    SWIG_PYTHON_THREAD_END_BLOCK;
+    return view;
+  }
+%}
+
 %rename(pn_delivery) wrap_pn_delivery;
 %inline %{
   pn_delivery_t *wrap_pn_delivery(pn_link_t *link, char *STRING, size_t LENGTH) {
@@ -400,4 +465,1116 @@ bool pn_ssl_get_protocol_name(pn_ssl_t *ssl, char *OUTPUT, size_t MAX_OUTPUT_SIZ
 
 %}
 
+%{
+/*
+ * Native conversion between python object trees and pn_data_t. The
+ * python classes used to represent the AMQP types (ulong, symbol,
+ * Described, Array, etc) are defined by the proton module, which
+ * registers them via pn_pycodec when it is first imported.
+ */
+typedef struct {
+  PyObject *ulong;
+  PyObject *timestamp;
+  PyObject *symbol;
+  PyObject *chr;
+  PyObject *uuid;
+  PyObject *described;
+  PyObject *array;
+  PyObject *undescribed;
+  PyObject *unmapped;
+  PyObject *converters;
+} pni_pycodec_t;
+
+static pni_pycodec_t pni_pycodec_types = {NULL};
+
+/* returned by the conversion routines when a python exception is set */
+#define PNI_PYERR (INT_MIN)
+
+#if PY_MAJOR_VERSION >= 3
+#define pni_pyint_from_long PyLong_FromLong
+#else
+#define pni_pyint_from_long PyInt_FromLong
+#endif
+
+static PyObject *pni_pyint_from_ulonglong(unsigned PY_LONG_LONG value) {
+  if (value > LONG_MAX) {
+    return PyLong_FromUnsignedLongLong(value);
+  } else {
+    return pni_pyint_from_long((long) value);
+  }
+}
+
+static PyObject *pni_pycall1(PyObject *callable, PyObject *arg) {
+  PyObject *result;
+  if (!arg) return NULL;
+  result = PyObject_CallFunctionObjArgs(callable, arg, NULL);
+  Py_DECREF(arg);
+  return result;
+}
+
+static int pni_data_put_pyobject(pn_data_t *data, PyObject *obj, PyObject *fallback);
+
+static int pni_data_put_pystring(pn_data_t *data, PyObject *obj, bool symbol) {
+  int err;
+  PyObject *encoded = symbol ? PyUnicode_AsASCIIString(obj) : PyUnicode_AsUTF8String(obj);
+  if (!encoded) return PNI_PYERR;
+  if (symbol) {
+    err = pn_data_put_symbol(data, pn_bytes(PyBytes_GET_SIZE(encoded), PyBytes_AS_STRING(encoded)));
+  } else {
+    err = pn_data_put_string(data, pn_bytes(PyBytes_GET_SIZE(encoded), PyBytes_AS_STRING(encoded)));
+  }
+  Py_DECREF(encoded);
+  return err;
+}
+
+static int pni_pychar_value(PyObject *obj, pn_char_t *c) {
+#if PY_MAJOR_VERSION >= 3
+  if (PyUnicode_READY(obj) < 0) return PNI_PYERR;
+  if (PyUnicode_GET_LENGTH(obj) != 1) {
+    PyErr_SetString(PyExc_TypeError, "char value must be a single character");
+    return PNI_PYERR;
+  }
+  *c = PyUnicode_READ_CHAR(obj, 0);
+#else
+  if (PyUnicode_GET_SIZE(obj) != 1) {
+    PyErr_SetString(PyExc_TypeError, "char value must be a single character");
+    return PNI_PYERR;
+  }
+  *c = PyUnicode_AS_UNICODE(obj)[0];
+#endif
+  return 0;
+}
+
+static int pni_data_put_pychar(pn_data_t *data, PyObject *obj) {
+  pn_char_t c;
+  int err = pni_pychar_value(obj, &c);
+  if (err) return err;
+  return pn_data_put_char(data, c);
+}
+
+static int pni_data_put_pyuuid(pn_data_t *data, PyObject *obj) {
+  pn_uuid_t u;
+  int err;
+  PyObject *bytes = PyObject_GetAttrString(obj, "bytes");
+  if (!bytes) return PNI_PYERR;
+  if (!PyBytes_Check(bytes)) {
+    Py_DECREF(bytes);
+    PyErr_SetString(PyExc_TypeError, "UUID bytes must be a binary value");
+    return PNI_PYERR;
+  }
+  memset(u.bytes, 0, 16);
+  memmove(u.bytes, PyBytes_AS_STRING(bytes), (PyBytes_GET_SIZE(bytes) < 16 ? PyBytes_GET_SIZE(bytes) : 16));
+  Py_DECREF(bytes);
+  err = pn_data_put_uuid(data, u);
+  return err;
+}
+
+static int pni_data_put_pyelements(pn_data_t *data, PyObject *elements, PyObject *fallback) {
+  int err = 0;
+  Py_ssize_t i;
+  PyObject *seq = PySequence_Fast(elements, "expected a sequence of elements");
+  if (!seq) return PNI_PYERR;
+  for (i = 0; !err && i < PySequence_Fast_GET_SIZE(seq); i++) {
+    err = pni_data_put_pyobject(data, PySequence_Fast_GET_ITEM(seq, i), fallback);
+  }
+  Py_DECREF(seq);
+  return err;
+}
+
+/*
+ * The elements of a numeric array may be held in typed storage such
+ * as an array.array or numpy.ndarray. When that storage exposes a
+ * contiguous buffer of native values of the same width and kind as
+ * the AMQP array type, elements are converted directly to and from
+ * the buffer without creating a python object per element.
+ */
+static size_t pni_pyarray_width(pn_type_t type) {
+  switch (type) {
+  case PN_BYTE:
+  case PN_UBYTE:
+    return 1;
+  case PN_SHORT:
+  case PN_USHORT:
+    return 2;
+  case PN_INT:
+  case PN_UINT:
+  case PN_FLOAT:
+    return 4;
+  case PN_LONG:
+  case PN_ULONG:
+  case PN_DOUBLE:
+    return 8;
+  default:
+    return 0;
+  }
+}
+
+static char pni_pyarray_kind(pn_type_t type) {
+  switch (type) {
+  case PN_FLOAT:
+  case PN_DOUBLE:
+    return 'f';
+  case PN_UBYTE:
+  case PN_USHORT:
+  case PN_UINT:
+  case PN_ULONG:
+    return 'u';
+  default:
+    return 'i';
+  }
+}
+
+static char pni_pyformat_kind(const char *format) {
+  static const union { uint16_t value; char first; } order = {1};
+  if (!format) return 'u';
+  switch (*format) {
+  case '@':
+  case '=':
+    format++;
+    break;
+  case '<':
+  case '>':
+  case '!':
+    if ((*format == '<') != (order.first == 1)) return 0;
+    format++;
+    break;
+  }
+  if (!format[0] || format[1]) return 0;
+  if (strchr("bhilq", format[0])) return 'i';
+  if (strchr("BHILQ", format[0])) return 'u';
+  if (strchr("fd", format[0])) return 'f';
+  return 0;
+}
+
+/*
+ * Acquires a buffer over typed storage for elements of the given type.
+ * Returns false, with no python error set, if obj is not such storage.
+ */
+static bool pni_pyarray_view(PyObject *obj, pn_type_t type, Py_buffer *view, int flags) {
+  size_t width = pni_pyarray_width(type);
+  if (!width || PyTuple_Check(obj) || PyList_Check(obj) || !PyObject_CheckBuffer(obj)) {
+    return false;
+  }
+  if (PyObject_GetBuffer(obj, view, flags | PyBUF_C_CONTIGUOUS | PyBUF_FORMAT) < 0) {
+    PyErr_Clear();
+    return false;
+  }
+  if ((size_t) view->itemsize != width || pni_pyformat_kind(view->format) != pni_pyarray_kind(type)) {
+    PyBuffer_Release(view);
+    return false;
+  }
+  return true;
+}
+
+#define PNI_PYVIEW_PUT(CTYPE, PUT)                              \
+  for (i = 0; !err && i < count; i++) {                         \
+    CTYPE value;                                                \
+    memcpy(&value, start + i*sizeof(CTYPE), sizeof(CTYPE));     \
+    err = PUT(data, value);                                     \
+  }                                                             \
+  break
+
+static int pni_data_put_pyview(pn_data_t *data, pn_type_t type, Py_buffer *view) {
+  int err = 0;
+  const char *start = (const char *) view->buf;
+  Py_ssize_t i, count = view->len / view->itemsize;
+  switch (type) {
+  case PN_BYTE: PNI_PYVIEW_PUT(int8_t, pn_data_put_byte);
+  case PN_UBYTE: PNI_PYVIEW_PUT(uint8_t, pn_data_put_ubyte);
+  case PN_SHORT: PNI_PYVIEW_PUT(int16_t, pn_data_put_short);
+  case PN_USHORT: PNI_PYVIEW_PUT(uint16_t, pn_data_put_ushort);
+  case PN_INT: PNI_PYVIEW_PUT(int32_t, pn_data_put_int);
+  case PN_UINT: PNI_PYVIEW_PUT(uint32_t, pn_data_put_uint);
+  case PN_LONG: PNI_PYVIEW_PUT(int64_t, pn_data_put_long);
+  case PN_ULONG: PNI_PYVIEW_PUT(uint64_t, pn_data_put_ulong);
+  case PN_FLOAT: PNI_PYVIEW_PUT(float, pn_data_put_float);
+  case PN_DOUBLE: PNI_PYVIEW_PUT(double, pn_data_put_double);
+  default: break;
+  }
+  return err;
+}
+
+#define PNI_PYVIEW_GET(CTYPE, GET)                              \
+  for (i = 0; i < count && pn_data_next(data); i++) {           \
+    CTYPE value = GET(data);                                    \
+    memcpy(start + i*sizeof(CTYPE), &value, sizeof(CTYPE));     \
+  }                                                             \
+  break
+
+static void pni_data_get_pyview(pn_data_t *data, pn_type_t type, Py_buffer *view) {
+  char *start = (char *) view->buf;
+  Py_ssize_t i, count = view->len / view->itemsize;
+  switch (type) {
+  case PN_BYTE: PNI_PYVIEW_GET(int8_t, pn_data_get_byte);
+  case PN_UBYTE: PNI_PYVIEW_GET(uint8_t, pn_data_get_ubyte);
+  case PN_SHORT: PNI_PYVIEW_GET(int16_t, pn_data_get_short);
+  case PN_USHORT: PNI_PYVIEW_GET(uint16_t, pn_data_get_ushort);
+  case PN_INT: PNI_PYVIEW_GET(int32_t, pn_data_get_int);
+  case PN_UINT: PNI_PYVIEW_GET(uint32_t, pn_data_get_uint);
+  case PN_LONG: PNI_PYVIEW_GET(int64_t, pn_data_get_long);
+  case PN_ULONG: PNI_PYVIEW_GET(uint64_t, pn_data_get_ulong);
+  case PN_FLOAT: PNI_PYVIEW_GET(float, pn_data_get_float);
+  case PN_DOUBLE: PNI_PYVIEW_GET(double, pn_data_get_double);
+  default: break;
+  }
+}
+
+static int pni_data_put_pydict(pn_data_t *data, PyObject *obj, PyObject *fallback) {
+  Py_ssize_t pos = 0;
+  PyObject *key, *value;
+  int err = pn_data_put_map(data);
+  if (err) return err;
+  pn_data_enter(data);
+  while (!err && PyDict_Next(obj, &pos, &key, &value)) {
+    Py_INCREF(key);
+    Py_INCREF(value);
+    err = pni_data_put_pyobject(data, key, fallback);
+    if (!err) err = pni_data_put_pyobject(data, value, fallback);
+    Py_DECREF(key);
+    Py_DECREF(value);
+  }
+  pn_data_exit(data);
+  return err;
+}
+
+static int pni_data_put_pydescribed(pn_data_t *data, PyObject *obj, PyObject *fallback) {
+  int err;
+  PyObject *descriptor, *value;
+  descriptor = PyObject_GetAttrString(obj, "descriptor");
+  if (!descriptor) return PNI_PYERR;
+  value = PyObject_GetAttrString(obj, "value");
+  if (!value) {
+    Py_DECREF(descriptor);
+    return PNI_PYERR;
+  }
+  err = pn_data_put_described(data);
+  if (!err) {
+    pn_data_enter(data);
+    err = pni_data_put_pyobject(data, descriptor, fallback);
+    if (!err) err = pni_data_put_pyobject(data, value, fallback);
+    pn_data_exit(data);
+  }
+  Py_DECREF(descriptor);
+  Py_DECREF(value);
+  return err;
+}
+
+static int pni_data_put_pyarray(pn_data_t *data, PyObject *obj, PyObject *fallback) {
+  int err = PNI_PYERR;
+  int described;
+  long type;
+  PyObject *descriptor = NULL, *pytype = NULL, *elements = NULL;
+  descriptor = PyObject_GetAttrString(obj, "descriptor");
+  if (!descriptor) goto done;
+  pytype = PyObject_GetAttrString(obj, "type");
+  if (!pytype) goto done;
+  elements = PyObject_GetAttrString(obj, "elements");
+  if (!elements) goto done;
+  described = PyObject_RichCompareBool(descriptor, pni_pycodec_types.undescribed, Py_NE);
+  if (described < 0) goto done;
+  type = PyLong_AsLong(pytype);
+  if (type == -1 && PyErr_Occurred()) goto done;
+  err = pn_data_put_array(data, described, (pn_type_t) type);
+  if (!err) {
+    pn_data_enter(data);
+    if (described) err = pni_data_put_pyobject(data, descriptor, fallback);
+    if (!err) {
+      Py_buffer view;
+      if (pni_pyarray_view(elements, (pn_type_t) type, &view, PyBUF_SIMPLE)) {
+        err = pni_data_put_pyview(data, (pn_type_t) type, &view);
+        PyBuffer_Release(&view);
+      } else {
+        err = pni_data_put_pyelements(data, elements, fallback);
+      }
+    }
+    pn_data_exit(data);
+  }
+ done:
+  Py_XDECREF(descriptor);
+  Py_XDECREF(pytype);
+  Py_XDECREF(elements);
+  return err;
+}
+
+static int pni_data_put_pyobject(pn_data_t *data, PyObject *obj, PyObject *fallback) {
+  PyObject *cls = (PyObject *) Py_TYPE(obj);
+  PyObject *result;
+  int err;
+
+  if (obj == Py_None) {
+    return pn_data_put_null(data);
+  } else if (cls == (PyObject *) &PyBool_Type) {
+    return pn_data_put_bool(data, obj == Py_True);
+  } else if (cls == (PyObject *) &PyUnicode_Type) {
+    return pni_data_put_pystring(data, obj, false);
+  } else if (cls == (PyObject *) &PyBytes_Type) {
+    return pn_data_put_binary(data, pn_bytes(PyBytes_GET_SIZE(obj), PyBytes_AS_STRING(obj)));
+  } else if (cls == (PyObject *) &PyFloat_Type) {
+    return pn_data_put_double(data, PyFloat_AS_DOUBLE(obj));
+#if PY_MAJOR_VERSION < 3
+  } else if (cls == (PyObject *) &PyInt_Type) {
+    long value = PyInt_AS_LONG(obj);
+    if (value < INT32_MIN || value > INT32_MAX) {
+      PyErr_SetString(PyExc_OverflowError, "int value out of range");
+      return PNI_PYERR;
+    }
+    return pn_data_put_int(data, (int32_t) value);
+#endif
+  } else if (cls == (PyObject *) &PyLong_Type || cls == pni_pycodec_types.timestamp) {
+    PY_LONG_LONG value = PyLong_AsLongLong(obj);
+    if (value == -1 && PyErr_Occurred()) return PNI_PYERR;
+    if (cls == pni_pycodec_types.timestamp) {
+      return pn_data_put_timestamp(data, value);
+    } else {
+      return pn_data_put_long(data, value);
+    }
+  } else if (cls == pni_pycodec_types.ulong) {
+    unsigned PY_LONG_LONG value = PyLong_AsUnsignedLongLong(obj);
+    if (value == (unsigned PY_LONG_LONG) -1 && PyErr_Occurred()) return PNI_PYERR;
+    return pn_data_put_ulong(data, value);
+  } else if (cls == pni_pycodec_types.symbol) {
+    return pni_data_put_pystring(data, obj, true);
+  } else if (cls == pni_pycodec_types.chr) {
+    return pni_data_put_pychar(data, obj);
+  } else if (cls == pni_pycodec_types.uuid) {
+    return pni_data_put_pyuuid(data, obj);
+  } else if (cls == (PyObject *) &PyDict_Type || cls == (PyObject *) &PyList_Type ||
+             cls == (PyObject *) &PyTuple_Type || cls == pni_pycodec_types.described ||
+             cls == pni_pycodec_types.array) {
+    if (Py_EnterRecursiveCall(" while encoding AMQP data")) return PNI_PYERR;
+    if (cls == (PyObject *) &PyDict_Type) {
+      err = pni_data_put_pydict(data, obj, fallback);
+    } else if (cls == pni_pycodec_types.described) {
+      err = pni_data_put_pydescribed(data, obj, fallback);
+    } else if (cls == pni_pycodec_types.array) {
+      err = pni_data_put_pyarray(data, obj, fallback);
+    } else {
+      err = pn_data_put_list(data);
+      if (!err) {
+        pn_data_enter(data);
+        err = pni_data_put_pyelements(data, obj, fallback);
+        pn_data_exit(data);
+      }
+    }
+    Py_LeaveRecursiveCall();
+    return err;
+  }
+
+  /* not one of the types known to the native codec */
+  result = PyObject_CallFunctionObjArgs(fallback, obj, NULL);
+  if (!result) return PNI_PYERR;
+  Py_DECREF(result);
+  return 0;
+}
+
+static PyObject *pni_data_get_pyobject(pn_data_t *data);
+
+/*
+ * Symbols and strings such as annotation and property keys repeat
+ * across many messages. Decoded values of up to PNI_PYINTERN_MAX_SIZE
+ * bytes are kept in a direct mapped cache keyed by a hash of their
+ * encoded bytes, so that repeated values share a single python object
+ * and symbols skip the call to the symbol constructor. Values are
+ * only ever replaced by another value hashing to the same slot, which
+ * bounds the cache at PNI_PYINTERN_SLOTS entries.
+ */
+#define PNI_PYINTERN_SLOTS (1024)
+#define PNI_PYINTERN_MAX_SIZE (64)
+
+typedef struct {
+  PyObject *value;
+  uint32_t hash;
+} pni_pyintern_t;
+
+static pni_pyintern_t pni_pyintern_cache[PNI_PYINTERN_SLOTS];
+
+static PyObject *pni_pystring_new(pn_bytes_t bytes, bool symbol) {
+  if (symbol) {
+    return pni_pycall1(pni_pycodec_types.symbol, PyUnicode_DecodeASCII(bytes.start, bytes.size, NULL));
+  } else {
+    return PyUnicode_DecodeUTF8(bytes.start, bytes.size, NULL);
+  }
+}
+
+static PyObject *pni_pystring(pn_bytes_t bytes, bool symbol) {
+#if PY_MAJOR_VERSION >= 3
+  if (bytes.size <= PNI_PYINTERN_MAX_SIZE) {
+    /* FNV-1a, seeded differently for symbols and strings */
+    uint32_t hash = symbol ? 2166136261u : 84696351u;
+    pni_pyintern_t *slot;
+    PyObject *value;
+    size_t i;
+    for (i = 0; i < bytes.size; i++) {
+      hash = (hash ^ (uint8_t) bytes.start[i]) * 16777619u;
+    }
+    slot = &pni_pyintern_cache[hash % PNI_PYINTERN_SLOTS];
+    if (slot->value && slot->hash == hash) {
+      Py_ssize_t size;
+      const char *utf8 = PyUnicode_AsUTF8AndSize(slot->value, &size);
+      if (utf8 && (size_t) size == bytes.size && !memcmp(utf8, bytes.start, bytes.size)) {
+        Py_INCREF(slot->value);
+        return slot->value;
+      }
+      PyErr_Clear();
+    }
+    value = pni_pystring_new(bytes, symbol);
+    if (value) {
+      Py_XDECREF(slot->value);
+      Py_INCREF(value);
+      slot->value = value;
+      slot->hash = hash;
+    }
+    return value;
+  }
+#endif
+  return pni_pystring_new(bytes, symbol);
+}
+
+static PyObject *pni_pystring_cstr(const char *value) {
+  if (value) {
+    return pni_pystring(pn_bytes(strlen(value), value), false);
+  } else {
+    Py_RETURN_NONE;
+  }
+}
+
+static PyObject *pni_data_get_pycompound(pn_data_t *data, pn_type_t type) {
+  PyObject *result = NULL, *key, *value, *converter;
+  PyObject *descriptor = NULL;
+  size_t count = 0;
+  bool described = false;
+  pn_type_t atype = PN_INVALID;
+
+  if (type == PN_ARRAY) {
+    count = pn_data_get_array(data);
+    described = pn_data_is_array_described(data);
+    atype = pn_data_get_array_type(data);
+    if (atype == PN_INVALID) Py_RETURN_NONE;
+  }
+  if (!pn_data_enter(data)) Py_RETURN_NONE;
+  if (Py_EnterRecursiveCall(" while decoding AMQP data")) {
+    pn_data_exit(data);
+    return NULL;
+  }
+
+  switch (type) {
+  case PN_DESCRIBED:
+    pn_data_next(data);
+    descriptor = pni_data_get_pyobject(data);
+    if (!descriptor) break;
+    pn_data_next(data);
+    value = pni_data_get_pyobject(data);
+    if (!value) break;
+    /* a registered converter takes the place of the generic Described */
+    converter = pni_pycodec_types.converters ? PyDict_GetItem(pni_pycodec_types.converters, descriptor) : NULL;
+    if (converter) {
+      Py_INCREF(converter);
+      result = pni_pycall1(converter, value);
+      Py_DECREF(converter);
+    } else {
+      result = PyObject_CallFunctionObjArgs(pni_pycodec_types.described, descriptor, value, NULL);
+      Py_DECREF(value);
+    }
+    break;
+  case PN_ARRAY:
+    if (described) {
+      pn_data_next(data);
+      descriptor = pni_data_get_pyobject(data);
+    } else {
+      descriptor = pni_pycodec_types.undescribed;
+      Py_INCREF(descriptor);
+    }
+    if (!descriptor) break;
+    result = Py_BuildValue("[ON]", descriptor, pni_pyint_from_long(atype));
+    while (result && pn_data_next(data)) {
+      value = pni_data_get_pyobject(data);
+      if (!value || PyList_Append(result, value)) {
+        Py_XDECREF(value);
+        Py_CLEAR(result);
+        break;
+      }
+      Py_DECREF(value);
+    }
+    if (result) {
+      value = PyList_AsTuple(result);
+      Py_DECREF(result);
+      result = value ? PyObject_CallObject(pni_pycodec_types.array, value) : NULL;
+      Py_XDECREF(value);
+    }
+    break;
+  case PN_LIST:
+    result = PyList_New(0);
+    while (result && pn_data_next(data)) {
+      value = pni_data_get_pyobject(data);
+      if (!value || PyList_Append(result, value)) {
+        Py_CLEAR(result);
+      }
+      Py_XDECREF(value);
+    }
+    break;
+  case PN_MAP:
+    result = PyDict_New();
+    while (result && pn_data_next(data)) {
+      key = pni_data_get_pyobject(data);
+      if (!key) {
+        Py_CLEAR(result);
+        break;
+      }
+      if (pn_data_next(data)) {
+        value = pni_data_get_pyobject(data);
+      } else {
+        value = Py_None;
+        Py_INCREF(value);
+      }
+      if (!value || PyDict_SetItem(result, key, value)) {
+        Py_CLEAR(result);
+      }
+      Py_DECREF(key);
+      Py_XDECREF(value);
+    }
+    break;
+  default:
+    break;
+  }
+
+  Py_XDECREF(descriptor);
+  Py_LeaveRecursiveCall();
+  pn_data_exit(data);
+  return result;
+}
+
+static PyObject *pni_data_get_pyobject(pn_data_t *data) {
+  pn_type_t type = pn_data_type(data);
+  switch (type) {
+  case PN_INVALID:
+  case PN_NULL:
+    Py_RETURN_NONE;
+  case PN_BOOL:
+    return PyBool_FromLong(pn_data_get_bool(data));
+  case PN_UBYTE:
+    return pni_pyint_from_long(pn_data_get_ubyte(data));
+  case PN_BYTE:
+    return pni_pyint_from_long(pn_data_get_byte(data));
+  case PN_USHORT:
+    return pni_pyint_from_long(pn_data_get_ushort(data));
+  case PN_SHORT:
+    return pni_pyint_from_long(pn_data_get_short(data));
+  case PN_UINT:
+    return pni_pyint_from_ulonglong(pn_data_get_uint(data));
+  case PN_INT:
+    return pni_pyint_from_long(pn_data_get_int(data));
+  case PN_CHAR:
+#if PY_MAJOR_VERSION >= 3
+    return pni_pycall1(pni_pycodec_types.chr, PyUnicode_FromOrdinal(pn_data_get_char(data)));
+#else
+    {
+      Py_UNICODE c = (Py_UNICODE) pn_data_get_char(data);
+      return pni_pycall1(pni_pycodec_types.chr, PyUnicode_FromUnicode(&c, 1));
+    }
+#endif
+  case PN_ULONG:
+    return pni_pycall1(pni_pycodec_types.ulong, PyLong_FromUnsignedLongLong(pn_data_get_ulong(data)));
+  case PN_LONG:
+    return PyLong_FromLongLong(pn_data_get_long(data));
+  case PN_TIMESTAMP:
+    return pni_pycall1(pni_pycodec_types.timestamp, PyLong_FromLongLong(pn_data_get_timestamp(data)));
+  case PN_FLOAT:
+    return PyFloat_FromDouble(pn_data_get_float(data));
+  case PN_DOUBLE:
+    return PyFloat_FromDouble(pn_data_get_double(data));
+  case PN_DECIMAL32:
+    return pni_pyint_from_ulonglong(pn_data_get_decimal32(data));
+  case PN_DECIMAL64:
+    return pni_pyint_from_ulonglong(pn_data_get_decimal64(data));
+  case PN_DECIMAL128:
+    return PyBytes_FromStringAndSize(pn_data_get_decimal128(data).bytes, 16);
+  case PN_UUID:
+    {
+      PyObject *args, *kwargs, *result = NULL;
+      PyObject *bytes = PyBytes_FromStringAndSize(pn_data_get_uuid(data).bytes, 16);
+      if (!bytes) return NULL;
+      args = PyTuple_New(0);
+      kwargs = Py_BuildValue("{s:N}", "bytes", bytes);
+      if (args && kwargs) {
+        result = PyObject_Call(pni_pycodec_types.uuid, args, kwargs);
+      }
+      Py_XDECREF(args);
+      Py_XDECREF(kwargs);
+      return result;
+    }
+  case PN_BINARY:
+    {
+      pn_bytes_t bytes = pn_data_get_binary(data);
+      return PyBytes_FromStringAndSize(bytes.start, bytes.size);
+    }
+  case PN_STRING:
+    return pni_pystring(pn_data_get_string(data), false);
+  case PN_SYMBOL:
+    return pni_pystring(pn_data_get_symbol(data), true);
+  case PN_DESCRIBED:
+  case PN_ARRAY:
+  case PN_LIST:
+  case PN_MAP:
+    return pni_data_get_pycompound(data, type);
+  default:
+    return pni_pycall1(pni_pycodec_types.unmapped, PyUnicode_FromFormat("%d", (int) type));
+  }
+}
+
+static bool pni_data_match_pyobject(pn_data_t *data, PyObject *obj);
+
+static bool pni_pystring_match(PyObject *obj, pn_bytes_t bytes) {
+  bool match;
+#if PY_MAJOR_VERSION >= 3
+  Py_ssize_t size;
+  const char *utf8 = PyUnicode_AsUTF8AndSize(obj, &size);
+  if (!utf8) return false;
+  match = (size_t) size == bytes.size && !memcmp(utf8, bytes.start, bytes.size);
+#else
+  PyObject *encoded = PyUnicode_AsUTF8String(obj);
+  if (!encoded) return false;
+  match = (size_t) PyBytes_GET_SIZE(encoded) == bytes.size &&
+    !memcmp(PyBytes_AS_STRING(encoded), bytes.start, bytes.size);
+  Py_DECREF(encoded);
+#endif
+  return match;
+}
+
+static bool pni_data_match_pyelements(pn_data_t *data, PyObject *elements, size_t count) {
+  bool match;
+  Py_ssize_t i;
+  PyObject *seq = PySequence_Fast(elements, "expected a sequence of elements");
+  if (!seq) return false;
+  match = (size_t) PySequence_Fast_GET_SIZE(seq) == count;
+  for (i = 0; match && i < PySequence_Fast_GET_SIZE(seq); i++) {
+    match = pn_data_next(data) && pni_data_match_pyobject(data, PySequence_Fast_GET_ITEM(seq, i));
+  }
+  Py_DECREF(seq);
+  return match;
+}
+
+#define PNI_PYVIEW_MATCH(CTYPE, GET)                            \
+  for (i = 0; match && i < count; i++) {                        \
+    CTYPE value;                                                \
+    memcpy(&value, start + i*sizeof(CTYPE), sizeof(CTYPE));     \
+    match = pn_data_next(data) && pn_data_type(data) == type && \
+      GET(data) == value;                                       \
+  }                                                             \
+  break
+
+static bool pni_data_match_pyview(pn_data_t *data, pn_type_t type, Py_buffer *view, size_t count) {
+  bool match = (size_t) (view->len / view->itemsize) == count;
+  const char *start = (const char *) view->buf;
+  size_t i;
+  switch (type) {
+  case PN_BYTE: PNI_PYVIEW_MATCH(int8_t, pn_data_get_byte);
+  case PN_UBYTE: PNI_PYVIEW_MATCH(uint8_t, pn_data_get_ubyte);
+  case PN_SHORT: PNI_PYVIEW_MATCH(int16_t, pn_data_get_short);
+  case PN_USHORT: PNI_PYVIEW_MATCH(uint16_t, pn_data_get_ushort);
+  case PN_INT: PNI_PYVIEW_MATCH(int32_t, pn_data_get_int);
+  case PN_UINT: PNI_PYVIEW_MATCH(uint32_t, pn_data_get_uint);
+  case PN_LONG: PNI_PYVIEW_MATCH(int64_t, pn_data_get_long);
+  case PN_ULONG: PNI_PYVIEW_MATCH(uint64_t, pn_data_get_ulong);
+  case PN_FLOAT: PNI_PYVIEW_MATCH(float, pn_data_get_float);
+  case PN_DOUBLE: PNI_PYVIEW_MATCH(double, pn_data_get_double);
+  default: match = false; break;
+  }
+  return match;
+}
+
+static bool pni_data_match_pydict(pn_data_t *data, PyObject *obj) {
+  Py_ssize_t pos = 0;
+  PyObject *key, *value;
+  bool match = true;
+  while (match && PyDict_Next(obj, &pos, &key, &value)) {
+    match = pn_data_next(data) && pni_data_match_pyobject(data, key) &&
+      pn_data_next(data) && pni_data_match_pyobject(data, value);
+  }
+  return match;
+}
+
+static bool pni_data_match_pyattrs(pn_data_t *data, PyObject *obj, const char *first, const char *second) {
+  bool match = false;
+  PyObject *a = PyObject_GetAttrString(obj, first);
+  PyObject *b = a ? PyObject_GetAttrString(obj, second) : NULL;
+  if (a && b) {
+    match = pn_data_next(data) && pni_data_match_pyobject(data, a) &&
+      pn_data_next(data) && pni_data_match_pyobject(data, b);
+  }
+  Py_XDECREF(a);
+  Py_XDECREF(b);
+  return match;
+}
+
+static bool pni_data_match_pyarray(pn_data_t *data, PyObject *obj) {
+  bool match = false;
+  int described;
+  PyObject *descriptor = NULL, *pytype = NULL, *elements = NULL;
+  descriptor = PyObject_GetAttrString(obj, "descriptor");
+  if (!descriptor) goto done;
+  pytype = PyObject_GetAttrString(obj, "type");
+  if (!pytype) goto done;
+  elements = PyObject_GetAttrString(obj, "elements");
+  if (!elements) goto done;
+  described = PyObject_RichCompareBool(descriptor, pni_pycodec_types.undescribed, Py_NE);
+  if (described < 0 || (bool) described != pn_data_is_array_described(data)) goto done;
+  if (PyLong_AsLong(pytype) != (long) pn_data_get_array_type(data)) goto done;
+  match = true;
+  {
+    size_t count = pn_data_get_array(data);
+    pn_type_t type = pn_data_get_array_type(data);
+    Py_buffer view;
+    pn_data_enter(data);
+    if (described) {
+      match = pn_data_next(data) && pni_data_match_pyobject(data, descriptor);
+    }
+    if (match && pni_pyarray_view(elements, type, &view, PyBUF_SIMPLE)) {
+      match = pni_data_match_pyview(data, type, &view, count);
+      PyBuffer_Release(&view);
+    } else {
+      match = match && pni_data_match_pyelements(data, elements, count);
+    }
+    pn_data_exit(data);
+  }
+ done:
+  Py_XDECREF(descriptor);
+  Py_XDECREF(pytype);
+  Py_XDECREF(elements);
+  return match;
+}
+
+/*
+ * Checks whether the current node of data is exactly what
+ * pni_data_put_pyobject would produce for obj, following the same
+ * type mapping. Values of unknown type never match.
+ */
+static bool pni_data_match_pyobject(pn_data_t *data, PyObject *obj) {
+  PyObject *cls = (PyObject *) Py_TYPE(obj);
+  pn_type_t type = pn_data_type(data);
+  bool match;
+
+  if (obj == Py_None) {
+    return type == PN_NULL;
+  } else if (cls == (PyObject *) &PyBool_Type) {
+    return type == PN_BOOL && pn_data_get_bool(data) == (obj == Py_True);
+  } else if (cls == (PyObject *) &PyUnicode_Type) {
+    return type == PN_STRING && pni_pystring_match(obj, pn_data_get_string(data));
+  } else if (cls == pni_pycodec_types.symbol) {
+    return type == PN_SYMBOL && pni_pystring_match(obj, pn_data_get_symbol(data));
+  } else if (cls == (PyObject *) &PyBytes_Type) {
+    pn_bytes_t bytes = pn_data_get_binary(data);
+    return type == PN_BINARY && (size_t) PyBytes_GET_SIZE(obj) == bytes.size &&
+      !memcmp(PyBytes_AS_STRING(obj), bytes.start, bytes.size);
+  } else if (cls == (PyObject *) &PyFloat_Type) {
+    return type == PN_DOUBLE && pn_data_get_double(data) == PyFloat_AS_DOUBLE(obj);
+#if PY_MAJOR_VERSION < 3
+  } else if (cls == (PyObject *) &PyInt_Type) {
+    return type == PN_INT && pn_data_get_int(data) == PyInt_AS_LONG(obj);
+#endif
+  } else if (cls == (PyObject *) &PyLong_Type) {
+    return type == PN_LONG && pn_data_get_long(data) == PyLong_AsLongLong(obj) && !PyErr_Occurred();
+  } else if (cls == pni_pycodec_types.timestamp) {
+    return type == PN_TIMESTAMP && pn_data_get_timestamp(data) == PyLong_AsLongLong(obj) && !PyErr_Occurred();
+  } else if (cls == pni_pycodec_types.ulong) {
+    return type == PN_ULONG && pn_data_get_ulong(data) == PyLong_AsUnsignedLongLong(obj) && !PyErr_Occurred();
+  } else if (cls == pni_pycodec_types.chr) {
+    pn_char_t c;
+    return type == PN_CHAR && !pni_pychar_value(obj, &c) && pn_data_get_char(data) == c;
+  } else if (cls == pni_pycodec_types.uuid) {
+    PyObject *bytes;
+    if (type != PN_UUID) return false;
+    bytes = PyObject_GetAttrString(obj, "bytes");
+    if (!bytes) return false;
+    match = PyBytes_Check(bytes) && PyBytes_GET_SIZE(bytes) == 16 &&
+      !memcmp(PyBytes_AS_STRING(bytes), pn_data_get_uuid(data).bytes, 16);
+    Py_DECREF(bytes);
+    return match;
+  } else if (cls == (PyObject *) &PyDict_Type || cls == (PyObject *) &PyList_Type ||
+             cls == (PyObject *) &PyTuple_Type || cls == pni_pycodec_types.described ||
+             cls == pni_pycodec_types.array) {
+    if (Py_EnterRecursiveCall(" while comparing AMQP data")) return false;
+    if (cls == (PyObject *) &PyDict_Type) {
+      match = type == PN_MAP && pn_data_get_map(data) == 2 * (size_t) PyDict_Size(obj);
+      if (match) {
+        pn_data_enter(data);
+        match = pni_data_match_pydict(data, obj);
+        pn_data_exit(data);
+      }
+    } else if (cls == pni_pycodec_types.described) {
+      match = type == PN_DESCRIBED;
+      if (match) {
+        pn_data_enter(data);
+        match = pni_data_match_pyattrs(data, obj, "descriptor", "value");
+        pn_data_exit(data);
+      }
+    } else if (cls == pni_pycodec_types.array) {
+      match = type == PN_ARRAY && pni_data_match_pyarray(data, obj);
+    } else {
+      match = type == PN_LIST;
+      if (match) {
+        size_t count = pn_data_get_list(data);
+        pn_data_enter(data);
+        match = pni_data_match_pyelements(data, obj, count);
+        pn_data_exit(data);
+      }
+    }
+    Py_LeaveRecursiveCall();
+    return match;
+  }
+
+  return false;
+}
+%}
+
+%inline %{
+  void pn_pycodec(PyObject *ulong, PyObject *timestamp, PyObject *symbol, PyObject *chr,
+                  PyObject *uuid, PyObject *described, PyObject *array,
+                  PyObject *undescribed, PyObject *unmapped, PyObject *converters) {
+    SWIG_PYTHON_THREAD_BEGIN_BLOCK;
+    Py_XINCREF(ulong);
+    Py_XINCREF(timestamp);
+    Py_XINCREF(symbol);
+    Py_XINCREF(chr);
+    Py_XINCREF(uuid);
+    Py_XINCREF(described);
+    Py_XINCREF(array);
+    Py_XINCREF(undescribed);
+    Py_XINCREF(unmapped);
+    Py_XINCREF(converters);
+    pni_pycodec_types.ulong = ulong;
+    pni_pycodec_types.timestamp = timestamp;
+    pni_pycodec_types.symbol = symbol;
+    pni_pycodec_types.chr = chr;
+    pni_pycodec_types.uuid = uuid;
+    pni_pycodec_types.described = described;
+    pni_pycodec_types.array = array;
+    pni_pycodec_types.undescribed = undescribed;
+    pni_pycodec_types.unmapped = unmapped;
+    pni_pycodec_types.converters = converters;
+    SWIG_PYTHON_THREAD_END_BLOCK;
+  }
+
+  /*
+   * Puts obj (and any children) after the current node of data. Values
+   * of a type not known to the native codec are handed to fallback.
+   * Returns the pn_data error code, or NULL if a python exception was
+   * raised.
+   */
+  PyObject *pn_data_put_pyobject(pn_data_t *data, PyObject *obj, PyObject *fallback) {
+    PyObject *result = NULL;
+    int err;
+    SWIG_PYTHON_THREAD_BEGIN_BLOCK;
+    err = pni_data_put_pyobject(data, obj, fallback);
+    if (err != PNI_PYERR) {
+      result = pni_pyint_from_long(err);
+    }
+    SWIG_PYTHON_THREAD_END_BLOCK;
+    return result;
+  }
+
+  /*
+   * Returns the value of the current node of data (and any children)
+   * as a python object.
+   */
+  PyObject *pn_data_get_pyobject(pn_data_t *data) {
+    PyObject *result;
+    SWIG_PYTHON_THREAD_BEGIN_BLOCK;
+    result = pni_data_get_pyobject(data);
+    SWIG_PYTHON_THREAD_END_BLOCK;
+    return result;
+  }
+
+  /*
+   * Returns the string (or symbol) value of the current node of data,
+   * sharing the python object with earlier occurrences of the same
+   * value where possible.
+   */
+  PyObject *pn_data_get_pystring(pn_data_t *data, bool symbol) {
+    PyObject *result;
+    SWIG_PYTHON_THREAD_BEGIN_BLOCK;
+    if (symbol) {
+      result = pni_pystring(pn_data_get_symbol(data), true);
+    } else {
+      result = pni_pystring(pn_data_get_string(data), false);
+    }
+    SWIG_PYTHON_THREAD_END_BLOCK;
+    return result;
+  }
+
+  PyObject *pn_message_get_pyaddress(pn_message_t *msg) {
+    PyObject *result;
+    SWIG_PYTHON_THREAD_BEGIN_BLOCK;
+    result = pni_pystring_cstr(pn_message_get_address(msg));
+    SWIG_PYTHON_THREAD_END_BLOCK;
+    return result;
+  }
+
+  PyObject *pn_message_get_pysubject(pn_message_t *msg) {
+    PyObject *result;
+    SWIG_PYTHON_THREAD_BEGIN_BLOCK;
+    result = pni_pystring_cstr(pn_message_get_subject(msg));
+    SWIG_PYTHON_THREAD_END_BLOCK;
+    return result;
+  }
+
+  PyObject *pn_message_get_pyreply_to(pn_message_t *msg) {
+    PyObject *result;
+    SWIG_PYTHON_THREAD_BEGIN_BLOCK;
+    result = pni_pystring_cstr(pn_message_get_reply_to(msg));
+    SWIG_PYTHON_THREAD_END_BLOCK;
+    return result;
+  }
+
+  /*
+   * Fills elements, typed storage such as an array.array or
+   * numpy.ndarray, with the elements of the array at the current node
+   * of data. Returns PN_ARG_ERR if elements does not expose a writable
+   * buffer of native values matching the array type and size.
+   */
+  int pn_data_get_array_into(pn_data_t *data, PyObject *elements) {
+    int err = PN_ARG_ERR;
+    pn_type_t type = pn_data_get_array_type(data);
+    Py_buffer view;
+    SWIG_PYTHON_THREAD_BEGIN_BLOCK;
+    if (pni_pyarray_view(elements, type, &view, PyBUF_WRITABLE)) {
+      if ((size_t) (view.len / view.itemsize) == pn_data_get_array(data)) {
+        bool described = pn_data_is_array_described(data);
+        pn_data_enter(data);
+        if (described) pn_data_next(data);
+        pni_data_get_pyview(data, type, &view);
+        pn_data_exit(data);
+        err = 0;
+      }
+      PyBuffer_Release(&view);
+    }
+    SWIG_PYTHON_THREAD_END_BLOCK;
+    return err;
+  }
+
+  /*
+   * Returns true if data holds a single top level value that is
+   * exactly the encoding of obj, i.e. putting obj into an empty data
+   * would produce the same content.
+   */
+  bool pn_data_matches_pyobject(pn_data_t *data, PyObject *obj) {
+    bool match;
+    SWIG_PYTHON_THREAD_BEGIN_BLOCK;
+    pn_data_rewind(data);
+    match = pn_data_next(data) && pni_data_match_pyobject(data, obj) && !pn_data_next(data);
+    if (PyErr_Occurred()) {
+      PyErr_Clear();
+      match = false;
+    }
+    pn_data_rewind(data);
+    SWIG_PYTHON_THREAD_END_BLOCK;
+    return match;
+  }
+
+  /*
+   * Sends a batch of messages encoded back to back in a buffer,
+   * creating a delivery with the corresponding tag for each, streaming
+   * its bytes and advancing past it. Returns a list of the deliveries.
+   * All the tags and sizes are checked before anything is sent, so on
+   * error no deliveries have been created.
+   */
+  PyObject *pn_link_send_batch(pn_link_t *link, const char *BIN_IN, size_t BIN_LEN,
+                               PyObject *sizes, PyObject *tags) {
+    PyObject *result = NULL;
+    PyObject *encoded = NULL;
+    Py_ssize_t *lengths = NULL;
+    Py_ssize_t i, count;
+    size_t offset = 0;
+    SWIG_PYTHON_THREAD_BEGIN_BLOCK;
+    count = PySequence_Size(sizes);
+    if (count >= 0 && PySequence_Size(tags) == count) {
+      encoded = PyList_New(count);
+      lengths = PyMem_New(Py_ssize_t, count ? count : 1);
+      if (!lengths) PyErr_NoMemory();
+    } else if (!PyErr_Occurred()) {
+      PyErr_SetString(PyExc_ValueError, "sizes and tags differ in length");
+    }
+    for (i = 0; encoded && lengths && i < count; i++) {
+      PyObject *size = PySequence_GetItem(sizes, i);
+      PyObject *tag = PySequence_GetItem(tags, i);
+      PyObject *bytes = NULL;
+      Py_ssize_t n = size ? PyNumber_AsSsize_t(size, PyExc_OverflowError) : -1;
+      if (tag && PyUnicode_Check(tag)) {
+        bytes = PyUnicode_AsUTF8String(tag);
+      } else if (tag && PyBytes_Check(tag)) {
+        bytes = tag;
+        Py_INCREF(bytes);
+      } else if (tag) {
+        PyErr_SetString(PyExc_TypeError, "delivery tags must be bytes or text");
+      }
+      if (bytes && n >= 0 && offset + n <= BIN_LEN) {
+        PyList_SET_ITEM(encoded, i, bytes);
+        lengths[i] = n;
+        offset += n;
+      } else {
+        if (!PyErr_Occurred()) {
+          PyErr_SetString(PyExc_ValueError, "sizes exceed the buffer");
+        }
+        Py_XDECREF(bytes);
+        Py_CLEAR(encoded);
+      }
+      Py_XDECREF(size);
+      Py_XDECREF(tag);
+    }
+    if (encoded && lengths) {
+      result = PyList_New(count);
+    }
+    offset = 0;
+    for (i = 0; result && i < count; i++) {
+      PyObject *tag = PyList_GET_ITEM(encoded, i);
+      pn_delivery_t *dlv = pn_delivery(link, pn_dtag(PyBytes_AS_STRING(tag),
+                                                     PyBytes_GET_SIZE(tag)));
+      pn_link_send(link, BIN_IN + offset, lengths[i]);
+      pn_link_advance(link);
+      offset += lengths[i];
+      PyList_SET_ITEM(result, i, SWIG_NewPointerObj(SWIG_as_voidptr(dlv), SWIGTYPE_p_pn_delivery_t, 0));
+    }
+    Py_XDECREF(encoded);
+    PyMem_Free(lengths);
+    SWIG_PYTHON_THREAD_END_BLOCK;
+    return result;
+  }
+
+  /*
+   * Receives up to limit (or, if limit is negative, all) of the
+   * complete deliveries at the head of a receiving link, advancing past
+   * each. Returns a list of (delivery, bytes) tuples.
+   */
+  PyObject *pn_link_recv_batch(pn_link_t *link, int limit) {
+    PyObject *result;
+    int count = 0;
+    SWIG_PYTHON_THREAD_BEGIN_BLOCK;
+    result = PyList_New(0);
+    while (result && (limit < 0 || count < limit)) {
+      pn_delivery_t *dlv = pn_link_current(link);
+      PyObject *bytes, *item;
+      size_t size = 0;
+      if (!dlv || !pn_delivery_readable(dlv) || pn_delivery_partial(dlv)) break;
+      bytes = PyBytes_FromStringAndSize(NULL, pn_delivery_pending(dlv));
+      while (bytes && size < (size_t) PyBytes_GET_SIZE(bytes)) {
+        ssize_t n = pn_link_recv(link, PyBytes_AS_STRING(bytes) + size,
+                                 PyBytes_GET_SIZE(bytes) - size);
+        if (n <= 0) break;
+        size += n;
+      }
+      if (bytes && size < (size_t) PyBytes_GET_SIZE(bytes)) {
+        _PyBytes_Resize(&bytes, size);
+      }
+      pn_link_advance(link);
+      item = bytes ? Py_BuildValue("(NN)", SWIG_NewPointerObj(SWIG_as_voidptr(dlv), SWIGTYPE_p_pn_delivery_t, 0), bytes) : NULL;
+      if (!item || PyList_Append(result, item)) {
+        Py_CLEAR(result);
+      }
+      Py_XDECREF(item);
+      count++;
+    }
+    SWIG_PYTHON_THREAD_END_BLOCK;
+    return result;
+  }
+%}
+
 %include "proton/cproton.i"
@@ -32,10 +32,10 @@ The proton APIs consist of the following classes:
 from __future__ import absolute_import
 
 from cproton import *
-from .wrapper import Wrapper
+from .wrapper import Wrapper, live_wrapper
 from . import _compat
 
-import weakref, socket, sys, threading
+import array, io, itertools, json, operator, weakref, socket, struct, sys, threading, zlib
 
 try:
   import uuid
@@ -781,9 +781,256 @@ first message.
     else:
       return None
 
+# descriptor codes of the AMQP message sections
+_HEADER = 0x70
+_DELIVERY_ANNOTATIONS = 0x71
+_MESSAGE_ANNOTATIONS = 0x72
+_PROPERTIES = 0x73
+_APPLICATION_PROPERTIES = 0x74
+_DATA = 0x75
+_AMQP_SEQUENCE = 0x76
+_AMQP_VALUE = 0x77
+_FOOTER = 0x78
+
+# widths of the fixed width AMQP encodings by format code category
+_FIXED_WIDTHS = {0x40: 0, 0x50: 1, 0x60: 2, 0x70: 4, 0x80: 8, 0x90: 16}
+
+def _value_size(encoded, offset):
+  """
+  Returns the size of the AMQP encoded value at offset, reading only
+  its constructor and size prefix.
+  """
+  code, = struct.unpack_from(">B", encoded, offset)
+  if code == 0x00:
+    # a described value, i.e. a descriptor followed by the value
+    size = 1 + _value_size(encoded, offset + 1)
+    return size + _value_size(encoded, offset + size)
+  category = code & 0xf0
+  if category in _FIXED_WIDTHS:
+    return 1 + _FIXED_WIDTHS[category]
+  elif category in (0xa0, 0xc0, 0xe0):
+    return 2 + struct.unpack_from(">B", encoded, offset + 1)[0]
+  elif category in (0xb0, 0xd0, 0xf0):
+    return 5 + struct.unpack_from(">I", encoded, offset + 1)[0]
+  else:
+    raise MessageException("invalid format code: 0x%02x" % code)
+
+def _leading_sections(encoded):
+  """
+  Locates the sections of an encoded message that precede its body (or
+  footer) from their size prefixes alone. Returns a list holding the
+  descriptor code, offset and size of each, along with the offset of
+  the body, or None if a section uses a symbolic descriptor.
+  """
+  sections = []
+  offset = 0
+  end = len(encoded)
+  while offset < end:
+    code, = struct.unpack_from(">B", encoded, offset + 1)
+    if code == 0x53:
+      descriptor, = struct.unpack_from(">B", encoded, offset + 2)
+    elif code == 0x80:
+      descriptor, = struct.unpack_from(">Q", encoded, offset + 2)
+    else:
+      # a symbolic descriptor, let the full decode deal with it
+      return None
+    if descriptor >= _DATA:
+      break
+    size = _value_size(encoded, offset)
+    sections.append((descriptor, offset, size))
+    offset += size
+  return sections, min(offset, end)
+
+def _body_offset(encoded):
+  """
+  Returns the offset of the body (or footer) section of an encoded
+  message, or the length of the message if it has neither.
+  """
+  try:
+    located = _leading_sections(encoded)
+  except struct.error:
+    located = None
+  if located is None:
+    return len(encoded)
+  return located[1]
+
+def _binary_body(encoded):
+  """
+  Locates a binary message body, held in either a single data section
+  or an amqp-value section, at the end of an encoded message. Returns
+  the offset of the body section and a memoryview of its binary
+  content, or None if there is no such body.
+  """
+  offset = _body_offset(encoded)
+  try:
+    constructor, code, descriptor, fmt = struct.unpack_from(">4B", encoded, offset)
+    if constructor != 0x00 or code != 0x53 or descriptor not in (_DATA, _AMQP_VALUE):
+      return None
+    elif fmt == 0xa0:
+      start = offset + 5
+      size, = struct.unpack_from(">B", encoded, offset + 4)
+    elif fmt == 0xb0:
+      start = offset + 8
+      size, = struct.unpack_from(">I", encoded, offset + 4)
+    else:
+      return None
+  except struct.error:
+    return None
+  view = memoryview(encoded)
+  if start + size != len(view):
+    return None
+  return offset, view[start:]
+
+class _MessageSection(object):
+  """
+  Descriptor for a L{Message} section that is held as a python object
+  but may still be in its encoded form if the message was decoded
+  lazily.
+  """
+
+  def __init__(self, name, accessor, doc):
+    self.name = name
+    self.attr = "_" + name
+    self.accessor = accessor
+    self.__doc__ = doc
+
+  def __get__(self, msg, cls):
+    if msg is None:
+      return self
+    if self.name in msg._encoded:
+      self.decode(msg)
+    return getattr(msg, self.attr)
+
+  def __set__(self, msg, value):
+    msg._encoded.discard(self.name)
+    setattr(msg, self.attr, value)
+
+  def defer(self, msg):
+    """
+    Marks the section as held in its encoded form only.
+    """
+    msg._encoded.add(self.name)
+    msg._clean.pop(self.name, None)
+    setattr(msg, self.attr, None)
+
+  def decode(self, msg):
+    """
+    Converts the encoded form of the section to a python object.
+    """
+    msg._encoded.discard(self.name)
+    data = Data(self.accessor(msg._msg))
+    data.rewind()
+    if data.next():
+      value = data.get_object()
+    else:
+      value = None
+    msg._clean[self.name] = value
+    setattr(msg, self.attr, value)
+
+  def encode(self, msg):
+    """
+    Writes the python value of the section into the underlying
+    pn_message, unless the section was never decoded in which case
+    its encoded form is left untouched. A value that is the same
+    object as was last written (or decoded) is only rewritten if it
+    has been mutated since, i.e. if it no longer matches its encoded
+    form.
+    """
+    if self.name in msg._encoded:
+      return
+    value = getattr(msg, self.attr)
+    if value is None and self.name in msg._clean and msg._clean[self.name] is None:
+      # the section is already empty
+      return
+    data = Data(self.accessor(msg._msg))
+    if value is None:
+      data.clear()
+    elif msg._clean.get(self.name) is not value or not data._matches(value):
+      data.clear()
+      data.put_object(value)
+    msg._clean[self.name] = value
+
+# body codecs registered with register_body_codec
+_content_type_codecs = {}
+_content_encoding_codecs = {}
+
+def _body_codecs(msg):
+  """
+  Returns the registered codecs that apply to the body of msg, in the
+  order they are applied when encoding.
+  """
+  codecs = []
+  if _content_type_codecs:
+    codec = _content_type_codecs.get(msg.content_type)
+    if codec is not None:
+      codecs.append(codec)
+  if _content_encoding_codecs:
+    codec = _content_encoding_codecs.get(msg.content_encoding)
+    if codec is not None:
+      codecs.append(codec)
+  return codecs
+
+def _decode_body(codecs, body):
+  for codec in reversed(codecs):
+    body = codec.decode(body)
+  return body
+
+class _BodySection(_MessageSection):
+  """
+  Descriptor for the body of a L{Message}, which is passed through the
+  registered L{BodyCodec}s for the content type and content encoding
+  of the message, if any.
+  """
+
+  def decode(self, msg):
+    codecs = _body_codecs(msg)
+    if codecs:
+      data = Data(self.accessor(msg._msg))
+      data.rewind()
+      if data.next() == Data.BINARY:
+        msg._encoded.discard(self.name)
+        msg._clean.pop(self.name, None)
+        setattr(msg, self.attr, _decode_body(codecs, data.get_binary()))
+        return
+    _MessageSection.decode(self, msg)
+
+  def encode(self, msg):
+    codecs = _body_codecs(msg)
+    value = getattr(msg, self.attr)
+    if not codecs or value is None or self.name in msg._encoded:
+      _MessageSection.encode(self, msg)
+      return
+    for codec in codecs:
+      value = codec.encode(value)
+    data = Data(self.accessor(msg._msg))
+    data.clear()
+    data.put_binary(value)
+    msg._clean.pop(self.name, None)
+
+def _merge_annotations(current, annotations):
+  merged = dict(current or {})
+  for key, value in _compat.iteritems(annotations):
+    if value is None:
+      merged.pop(key, None)
+    else:
+      merged[key] = value
+  return merged
+
+# the sections that may be decoded to and encoded from columns
+_COLUMN_SECTIONS = {
+  "body": pn_message_body,
+  "properties": pn_message_properties
+  }
+
 class Message(object):
   """The L{Message} class is a mutable holder of message content.
 
+  A message created with C{lazy=True} does not convert the
+  instructions, annotations, properties and body sections to python
+  objects when it is decoded. Each section is converted on first
+  access and any section that is never accessed is re-encoded from
+  its decoded form without a round trip through python.
+
   @ivar instructions: delivery instructions for the message
   @type instructions: dict
   @ivar annotations: infrastructure defined message annotations
@@ -796,13 +1043,21 @@ class Message(object):
 
   DEFAULT_PRIORITY = PN_DEFAULT_PRIORITY
 
-  def __init__(self, body=None, **kwargs):
+  __slots__ = ("_msg", "_id", "_correlation_id", "_encoded", "_clean", "lazy",
+               "_instructions", "_annotations", "_properties", "_body")
+
+  def __init__(self, body=None, lazy=False, **kwargs):
     """
+    @param lazy: if True, sections of a decoded message are only
+    converted to python objects when they are first accessed
     @param kwargs: Message property name/value pairs to initialise the Message
     """
     self._msg = pn_message()
-    self._id = Data(pn_message_id(self._msg))
-    self._correlation_id = Data(pn_message_correlation_id(self._msg))
+    self._id = None
+    self._correlation_id = None
+    self._encoded = set()
+    self._clean = dict(Message._EMPTY_SECTIONS)
+    self.lazy = lazy
     self.instructions = None
     self.annotations = None
     self.properties = None
@@ -824,46 +1079,17 @@ class Message(object):
       return err
 
   def _pre_encode(self):
-    inst = Data(pn_message_instructions(self._msg))
-    ann = Data(pn_message_annotations(self._msg))
-    props = Data(pn_message_properties(self._msg))
-    body = Data(pn_message_body(self._msg))
-
-    inst.clear()
-    if self.instructions is not None:
-      inst.put_object(self.instructions)
-    ann.clear()
-    if self.annotations is not None:
-      ann.put_object(self.annotations)
-    props.clear()
-    if self.properties is not None:
-      props.put_object(self.properties)
-    body.clear()
-    if self.body is not None:
-      body.put_object(self.body)
+    for section in self._sections:
+      section.encode(self)
 
   def _post_decode(self):
-    inst = Data(pn_message_instructions(self._msg))
-    ann = Data(pn_message_annotations(self._msg))
-    props = Data(pn_message_properties(self._msg))
-    body = Data(pn_message_body(self._msg))
-
-    if inst.next():
-      self.instructions = inst.get_object()
-    else:
-      self.instructions = None
-    if ann.next():
-      self.annotations = ann.get_object()
-    else:
-      self.annotations = None
-    if props.next():
-      self.properties = props.get_object()
-    else:
-      self.properties = None
-    if body.next():
-      self.body = body.get_object()
-    else:
-      self.body = None
+    # a body with codecs is only decoded when it is accessed
+    codecs = not self.lazy and _body_codecs(self)
+    for section in self._sections:
+      if self.lazy or (codecs and section is Message.body):
+        section.defer(self)
+      else:
+        section.decode(self)
 
   def clear(self):
     """
@@ -871,11 +1097,71 @@ class Message(object):
     their default values.
     """
     pn_message_clear(self._msg)
+    self._clean = dict(Message._EMPTY_SECTIONS)
     self.instructions = None
     self.annotations = None
     self.properties = None
     self.body = None
 
+  instructions = _MessageSection("instructions", pn_message_instructions,
+                                 doc="""
+The delivery instructions for the message.
+""")
+
+  annotations = _MessageSection("annotations", pn_message_annotations,
+                                doc="""
+The infrastructure defined message annotations.
+""")
+
+  properties = _MessageSection("properties", pn_message_properties,
+                               doc="""
+The application defined message properties.
+""")
+
+  body = _BodySection("body", pn_message_body,
+                      doc="""
+The message body. If a L{BodyCodec} is registered for the content type
+or content encoding of the message, the body is passed through it when
+the message is encoded, and is decoded by it when first accessed after
+the message is decoded.
+""")
+
+  _sections = (instructions, annotations, properties, body)
+  # the sections of a new or cleared pn_message are all empty
+  _EMPTY_SECTIONS = dict.fromkeys([section.name for section in _sections])
+
+  def iter_body(self):
+    """
+    Returns an iterator over the elements of a list or array body, or
+    over the (key, value) pairs of a map body. Any other body is
+    produced as a single value, and no body as no values at all.
+
+    For a lazy message whose body has not been accessed, each element
+    is converted to a python object only when it is reached, so a
+    large body is never held in python as a whole.
+    """
+    if "body" in self._encoded and not _body_codecs(self):
+      data = Data(pn_message_body(self._msg))
+      data.rewind()
+      if not data.next():
+        return iter(())
+      type = data.type()
+      if type in (Data.LIST, Data.ARRAY):
+        return data.iter_sequence()
+      elif type == Data.MAP:
+        return data.iter_items()
+      else:
+        return iter((data.get_object(),))
+    body = self.body
+    if body is None:
+      return iter(())
+    elif isinstance(body, dict):
+      return iter(body.items())
+    elif isinstance(body, (list, tuple, Array)):
+      return iter(body)
+    else:
+      return iter((body,))
+
   def _is_inferred(self):
     return pn_message_is_inferred(self._msg)
 
@@ -949,13 +1235,19 @@ The number of delivery attempts made for this message.
 """)
 
 
+  def _id_data(self):
+    if self._id is None:
+      self._id = Data(pn_message_id(self._msg))
+    return self._id
+
   def _get_id(self):
-    return self._id.get_object()
+    return self._id_data().get_object()
   def _set_id(self, value):
     if type(value) in _compat.INT_TYPES:
       value = ulong(value)
-    self._id.rewind()
-    self._id.put_object(value)
+    data = self._id_data()
+    data.rewind()
+    data.put_object(value)
   id = property(_get_id, _set_id,
                 doc="""
 The id of the message.
@@ -973,6 +1265,8 @@ The user id of the message creator.
 """)
 
   def _get_address(self):
+    if _INTERN_STRINGS:
+      return pn_message_get_pyaddress(self._msg)
     return utf82unicode(pn_message_get_address(self._msg))
 
   def _set_address(self, value):
@@ -984,6 +1278,8 @@ The address of the message.
 """)
 
   def _get_subject(self):
+    if _INTERN_STRINGS:
+      return pn_message_get_pysubject(self._msg)
     return pn_message_get_subject(self._msg)
 
   def _set_subject(self, value):
@@ -995,6 +1291,8 @@ The subject of the message.
 """)
 
   def _get_reply_to(self):
+    if _INTERN_STRINGS:
+      return pn_message_get_pyreply_to(self._msg)
     return utf82unicode(pn_message_get_reply_to(self._msg))
 
   def _set_reply_to(self, value):
@@ -1005,13 +1303,19 @@ The subject of the message.
 The reply-to address for the message.
 """)
 
+  def _correlation_id_data(self):
+    if self._correlation_id is None:
+      self._correlation_id = Data(pn_message_correlation_id(self._msg))
+    return self._correlation_id
+
   def _get_correlation_id(self):
-    return self._correlation_id.get_object()
+    return self._correlation_id_data().get_object()
   def _set_correlation_id(self, value):
     if type(value) in _compat.INT_TYPES:
       value = ulong(value)
-    self._correlation_id.rewind()
-    self._correlation_id.put_object(value)
+    data = self._correlation_id_data()
+    data.rewind()
+    data.put_object(value)
 
   correlation_id = property(_get_correlation_id, _set_correlation_id,
                             doc="""
@@ -1095,32 +1399,397 @@ The sequence of the message within its group.
 The group-id for any replies.
 """)
 
-  def encode(self):
+  # per-thread scratch buffers used by encode() and send()
+  _buffers = threading.local()
+  BUFFER_SIZE = 1024
+  MAX_POOLED_BUFFER_SIZE = 1024*1024
+
+  def _encode_pooled(self, pre_encode=True):
+    """
+    Encodes the message into the scratch buffer of the calling thread,
+    growing it to the exact encoded size if it is too small. Returns
+    the buffer and the encoded size. The buffer contents are only valid
+    until the next encode on the same thread.
+    """
+    buf, size = self._encode_scratch(Message._get_buffer(), pre_encode)
+    Message._put_buffer(buf)
+    return buf, size
+
+  def _encode_scratch(self, buf, pre_encode=True):
+    if pre_encode:
+      self._pre_encode()
+    size = pn_message_encode_into(self._msg, buf)
+    if size == PN_OVERFLOW:
+      buf = bytearray(self._check(pn_message_encoded_size(self._msg)))
+      size = pn_message_encode_into(self._msg, buf)
+    return buf, self._check(size)
+
+  @classmethod
+  def _encode_batch(cls, messages, encode=None):
+    """
+    Encodes messages back to back into a single buffer. Returns the
+    buffer and a list of the encoded size of each message.
+    """
+    buf = bytearray(cls.BUFFER_SIZE)
+    sizes = []
+    offset = 0
+    for msg in messages:
+      if encode is None:
+        msg._pre_encode()
+        size = pn_message_encode_into(msg._msg, memoryview(buf)[offset:])
+        if size == PN_OVERFLOW:
+          needed = offset + msg._check(pn_message_encoded_size(msg._msg))
+          buf.extend(bytearray(max(needed, 2*len(buf)) - len(buf)))
+          size = pn_message_encode_into(msg._msg, memoryview(buf)[offset:])
+        msg._check(size)
+      else:
+        scratch, size = encode(msg)
+        if offset + size > len(buf):
+          buf.extend(bytearray(max(offset + size, 2*len(buf)) - len(buf)))
+        buf[offset:offset + size] = memoryview(scratch)[:size]
+      sizes.append(size)
+      offset += size
+    return buf, sizes
+
+  @classmethod
+  def _get_buffer(cls):
+    buf = getattr(cls._buffers, "buffer", None)
+    if buf is None:
+      buf = bytearray(cls.BUFFER_SIZE)
+    return buf
+
+  @classmethod
+  def _put_buffer(cls, buf):
+    if len(buf) <= cls.MAX_POOLED_BUFFER_SIZE:
+      cls._buffers.buffer = buf
+
+  def encoded_size(self):
+    """
+    Returns the number of bytes needed to encode the message.
+    """
     self._pre_encode()
-    sz = 16
-    while True:
-      err, data = pn_message_encode(self._msg, sz)
-      if err == PN_OVERFLOW:
-        sz *= 2
-        continue
+    return self._check(pn_message_encoded_size(self._msg))
+
+  def encode_into(self, buffer):
+    """
+    Encodes the message into a caller supplied writable buffer such as
+    a bytearray or memoryview and returns the number of bytes written.
+    A L{MessageException} is raised if the buffer is too small; use
+    L{encoded_size} to find the size required.
+
+    @param buffer: a writable buffer
+    @return: the number of bytes written
+    """
+    self._pre_encode()
+    return self._check(pn_message_encode_into(self._msg, buffer))
+
+  def encode(self):
+    buf, size = self._encode_pooled()
+    return memoryview(buf)[:size].tobytes()
+
+  def decode(self, data, copy=True):
+    """
+    Decodes an encoded message into this message.
+
+    If copy is False and the body of the message is a single binary
+    value, the body is not copied but returned as a memoryview
+    slice of data, or passed as such to any L{BodyCodec} that
+    applies. Such a view keeps data alive and shares its memory, so
+    data must not be modified for as long as the body is in use.
+
+    @param data: the encoded message, as bytes or any other object
+    supporting the buffer protocol such as a bytearray, memoryview or
+    mmap
+    @param copy: whether a binary body is copied out of data
+    """
+    body = None if copy else _binary_body(data)
+    if body is None:
+      self._check(pn_message_decode(self._msg, data))
+      self._post_decode()
+    else:
+      offset, view = body
+      self._check(pn_message_decode(self._msg, memoryview(data)[:offset]))
+      self._post_decode()
+      self.body = _decode_body(_body_codecs(self), view)
+
+  @classmethod
+  def peek_headers(cls, encoded, lazy=False):
+    """
+    Decodes everything but the body of an encoded message. The leading
+    sections are located from their size prefixes alone, so the body
+    is neither decoded nor copied. This is intended for routing
+    decisions that depend only on the header, properties, annotations
+    or application properties of a message.
+
+    @param encoded: an encoded message
+    @param lazy: whether the returned message decodes lazily
+    @return: a L{Message} without a body, unless the sections use
+    symbolic descriptors in which case the message is decoded in full
+    """
+    msg = cls(lazy=lazy)
+    msg.decode(encoded[:_body_offset(encoded)])
+    return msg
+
+  @classmethod
+  def patch_annotations(cls, encoded, annotations):
+    """
+    Adds, replaces or removes message annotations of an encoded
+    message without decoding the rest of it. Only the message
+    annotations section is decoded and re-encoded; the bytes of every
+    other section are copied as they are:
+
+      >>> Message.patch_annotations(encoded, {symbol("x-hops"): 2})
+
+    @param encoded: an encoded message, which is patched in place if
+    it is a bytearray
+    @param annotations: a dict of the annotations to set, where a
+    value of None removes the annotation
+    @return: the patched message, as a bytearray
+    """
+    try:
+      located = _leading_sections(encoded)
+    except struct.error:
+      located = None
+    if located is None:
+      # the sections cannot be located from their size prefixes
+      msg = cls()
+      msg.decode(encoded)
+      msg.annotations = _merge_annotations(msg.annotations, annotations)
+      patched = bytearray(msg.encode())
+      if isinstance(encoded, bytearray):
+        encoded[:] = patched
+        return encoded
+      return patched
+
+    sections, start = located
+    end = start
+    current = None
+    for descriptor, offset, size in sections:
+      if descriptor == _MESSAGE_ANNOTATIONS:
+        start, end = offset, offset + size
+        data = Data()
+        data.decode(memoryview(encoded)[start:end].tobytes())
+        data.rewind()
+        data.next()
+        current = data.get_object().value
+        break
+      elif descriptor > _MESSAGE_ANNOTATIONS:
+        start = end = offset
+        break
+
+    merged = _merge_annotations(current, annotations)
+    if merged:
+      data = Data()
+      data.put_described()
+      data.enter()
+      data.put_ulong(_MESSAGE_ANNOTATIONS)
+      data.put_object(merged)
+      data.exit()
+      section = data.encode()
+    else:
+      section = b""
+
+    if isinstance(encoded, bytearray):
+      encoded[start:end] = section
+      return encoded
+    view = memoryview(encoded)
+    patched = bytearray(view[:start])
+    patched += section
+    patched += view[end:]
+    return patched
+
+  @classmethod
+  def encode_many(cls, messages):
+    """
+    Encodes a sequence of messages in one call, sharing a single
+    scratch buffer across the whole batch.
+
+    @param messages: the messages to encode
+    @return: a list holding the encoded bytes of each message
+    """
+    buf = cls._get_buffer()
+    view = memoryview(buf)
+    result = []
+    append = result.append
+    for msg in messages:
+      scratch, size = msg._encode_scratch(buf)
+      if scratch is not buf:
+        buf = scratch
+        view = memoryview(buf)
+      append(view[:size].tobytes())
+    cls._put_buffer(buf)
+    return result
+
+  @classmethod
+  def decode_many(cls, buffers, messages=None, lazy=False):
+    """
+    Decodes a sequence of encoded messages in one call.
+
+    @param buffers: the encoded messages
+    @param messages: optional messages to decode into, for instance
+    ones previously obtained from a L{MessagePool}; there must be at
+    least as many as there are buffers
+    @param lazy: whether newly created messages decode lazily
+    @return: a list holding the decoded messages
+    """
+    decode = pn_message_decode
+    if messages is not None:
+      messages = iter(messages)
+    result = []
+    append = result.append
+    for data in buffers:
+      if messages is None:
+        msg = cls(lazy=lazy)
       else:
-        self._check(err)
-        return data
+        msg = next(messages)
+      msg._check(decode(msg._msg, data))
+      msg._post_decode()
+      append(msg)
+    return result
 
-  def decode(self, data):
-    self._check(pn_message_decode(self._msg, data))
-    self._post_decode()
+  @classmethod
+  def decode_columns(cls, buffers, section="body", fields=None, storage=array.array):
+    """
+    Decodes a sequence of encoded messages whose body, or application
+    properties, is a map, gathering the value of each key into a
+    column. No message or map is created in python. A column whose
+    values all have the same numeric AMQP type is returned as typed
+    storage, any other column as a list that holds None for the
+    messages that lack the key:
+
+      >>> columns = Message.decode_columns(buffers, fields=["x", "y"])
+      >>> columns["x"]
+      array('d', [0.5, 1.5, 2.5])
+
+    @param buffers: the encoded messages, or deliveries received with
+    L{Message.recv}
+    @param section: "body" or "properties"
+    @param fields: the keys to gather, or None for all of them
+    @param storage: the kind of typed storage for numeric columns,
+    C{array.array} or C{numpy.ndarray}
+    @return: a dict mapping each key to its column
+    """
+    accessor = _COLUMN_SECTIONS[section]
+    wanted = None if fields is None else set(fields)
+    columns = {}
+    types = {}
+    msg = cls()
+    data = Data(accessor(msg._msg))
+    row = 0
+    for encoded in buffers:
+      if isinstance(encoded, Delivery):
+        encoded = encoded.encoded
+      msg._check(pn_message_decode(msg._msg, encoded))
+      data.rewind()
+      if data.next() != Data.MAP:
+        raise MessageException("%s of message %s is not a map" % (section, row))
+      for key, type in data._iter_columns():
+        if wanted is not None and key not in wanted:
+          continue
+        column = columns.get(key)
+        if column is None:
+          if row == 0 and type in _ARRAY_STORAGE:
+            column = array.array(_ARRAY_STORAGE[type][0])
+            types[key] = type
+          else:
+            column = [None]*row
+            types[key] = None
+          columns[key] = column
+        elif types[key] is not None and types[key] != type:
+          column = columns[key] = list(column)
+          types[key] = None
+        column.append(data.get_object())
+      row += 1
+      for key, column in _compat.iteritems(columns):
+        if len(column) < row:
+          if types[key] is not None:
+            column = columns[key] = list(column)
+            types[key] = None
+          column.append(None)
+    if fields is not None:
+      for key in fields:
+        if key not in columns:
+          columns[key] = [None]*row
+          types[key] = None
+    if storage is not array.array:
+      for key, type in _compat.iteritems(types):
+        if type is not None:
+          columns[key] = _typed_storage(storage, type, elements=columns[key])
+    return columns
+
+  @classmethod
+  def encode_columns(cls, columns, section="body", template=None):
+    """
+    Encodes a batch of messages from columns, the reverse of
+    L{decode_columns}. The body, or application properties, of the
+    Nth message is a map holding the Nth value of each column under
+    its key, leaving out None values. Values held in typed storage are
+    encoded with the AMQP type matching their C type.
+
+    @param columns: a dict mapping each key to a sequence of values,
+    all of the same length
+    @param section: "body" or "properties"
+    @param template: an optional L{Message} supplying the other
+    sections of every message
+    @return: a list holding the encoded bytes of each message
+    """
+    accessor = _COLUMN_SECTIONS[section]
+    counts = set(len(column) for column in columns.values())
+    if len(counts) > 1:
+      raise ValueError("columns differ in length: %s" % sorted(counts))
+    count = counts.pop() if counts else 0
+    msg = cls()
+    if template is not None:
+      msg.decode(template.encode())
+    msg._pre_encode()
+    data = Data(accessor(msg._msg))
+    typed_puts = {
+      Data.BYTE: data.put_byte, Data.UBYTE: data.put_ubyte,
+      Data.SHORT: data.put_short, Data.USHORT: data.put_ushort,
+      Data.INT: data.put_int, Data.UINT: data.put_uint,
+      Data.LONG: data.put_long, Data.ULONG: data.put_ulong,
+      Data.FLOAT: data.put_float, Data.DOUBLE: data.put_double
+      }
+    puts = []
+    for key, column in _compat.iteritems(columns):
+      put = data.put_object
+      if _is_typed_storage(column):
+        put = typed_puts.get(_storage_type(column), put)
+        if not isinstance(column, array.array):
+          # numpy scalars are converted to python numbers in one go
+          column = column.tolist()
+      puts.append((key, column, put))
+    buf = cls._get_buffer()
+    view = memoryview(buf)
+    result = []
+    for i in range(count):
+      data.clear()
+      data.put_map()
+      data.enter()
+      for key, column, put in puts:
+        value = column[i]
+        if value is not None:
+          data.put_object(key)
+          put(value)
+      data.exit()
+      scratch, size = msg._encode_scratch(buf, False)
+      if scratch is not buf:
+        buf = scratch
+        view = memoryview(buf)
+      result.append(view[:size].tobytes())
+    cls._put_buffer(buf)
+    return result
 
   def send(self, sender, tag=None):
-    dlv = sender.delivery(tag or sender.delivery_tag())
-    encoded = self.encode()
-    sender.stream(encoded)
-    sender.advance()
-    if sender.snd_settle_mode == Link.SND_SETTLED:
-      dlv.settle()
-    return dlv
+    # see proton.reactor.Compression
+    compression = getattr(sender, "compression", None)
+    if compression is None:
+      buf, size = self._encode_pooled()
+    else:
+      buf, size = compression.encode(self)
+    return sender.send_encoded(_compat.buffer_slice(buf, size), tag)
 
-  def recv(self, link):
+  def recv(self, link, keep_encoded=True):
     """
     Receives and decodes the message content for the current delivery
     from the link. Upon success it will return the current delivery
@@ -1128,21 +1797,35 @@ The group-id for any replies.
     delivery is incomplete, or if the link is not a receiver, it will
     return None.
 
+    Unless keep_encoded is False the content is received into a new
+    bytes object, which is kept as the encoded attribute of the
+    delivery. Otherwise it is received into a buffer kept with the link
+    and reused for each message.
+
     @type link: Link
     @param link: the link to receive a message from
+    @param keep_encoded: whether to keep the encoded message on the
+    delivery
     @return the delivery associated with the decoded message (or None)
 
     """
     if link.is_sender: return None
     dlv = link.current
     if not dlv or dlv.partial: return None
-    dlv.encoded = link.recv(dlv.pending)
+    if keep_encoded:
+      encoded = dlv.encoded = link.recv(dlv.pending)
+    else:
+      encoded = link._scratch(dlv.pending)
+      encoded = encoded[:link.recv_into(encoded)]
     link.advance()
     # the sender has already forgotten about the delivery, so we might
     # as well too
     if link.remote_snd_settle_mode == Link.SND_SETTLED:
       dlv.settle()
-    self.decode(dlv.encoded)
+    self.decode(encoded)
+    compression = getattr(link, "compression", None)
+    if compression is not None:
+      compression.decode(self)
     return dlv
 
   def __repr2__(self):
@@ -1164,6 +1847,334 @@ The group-id for any replies.
     self._check(err)
     return result
 
+class MessageTemplate(object):
+  """
+  A L{MessageTemplate} holds the encoded form of the parts of a
+  message that stay the same from one send to the next: the header,
+  delivery and message annotations, the properties section and the
+  application properties. Producing a message from the template only
+  encodes the id, correlation-id, creation-time and body, which are
+  spliced into the pre-encoded sections.
+
+    >>> template = MessageTemplate(Message(address="telemetry",
+    ...                                    properties={"unit": "C"}))
+    >>> template.send(sender, body=21.5, id=17)
+
+  The id, correlation-id, creation-time and body of the message the
+  template is created from are ignored. Bodies are passed through any
+  L{BodyCodec}s registered for the content type and content encoding
+  of that message, as they would be by L{Message.encode}.
+  """
+
+  _NULL = b"\x40"
+
+  def __init__(self, message):
+    """
+    @type message: Message
+    @param message: the prototype for all messages produced from the
+    template
+    """
+    proto = Message(lazy=True)
+    proto.decode(message.encode())
+    proto.id = None
+    proto.correlation_id = None
+    proto.body = None
+    self.inferred = message.inferred
+    # looked up by _body_codecs when a body is encoded
+    self.content_type = message.content_type
+    self.content_encoding = message.content_encoding
+    self._scratch = Data()
+
+    head = []
+    tail = []
+    fields = None
+    encoded = proto.encode()
+    while encoded:
+      size = self._scratch.decode(encoded)
+      section, encoded = encoded[:size], encoded[size:]
+      if self._descriptor() == _PROPERTIES:
+        fields = self._split_properties(section)
+      elif fields is None:
+        head.append(section)
+      else:
+        tail.append(section)
+
+    # the properties section is re-assembled as a described list32
+    self._head = b"".join(head) + b"\x00\x53\x73"
+    self._before_correlation_id = b"".join(fields[1:5])
+    self._before_creation_time = b"".join(fields[6:9])
+    self._after_creation_time = b"".join(fields[10:])
+    self._properties_size = 4 + len(self._before_correlation_id) + \
+        len(self._before_creation_time) + len(self._after_creation_time)
+    self._properties_count = len(fields)
+    self._tail = b"".join(tail)
+
+  def _descriptor(self):
+    scratch = self._scratch
+    scratch.rewind()
+    scratch.next()
+    scratch.enter()
+    scratch.next()
+    descriptor = scratch.get_object()
+    scratch.exit()
+    scratch.clear()
+    return descriptor
+
+  def _split_properties(self, section):
+    # skip the described constructor and the descriptor itself
+    offset = 1 + self._scratch.decode(section[1:])
+    self._scratch.clear()
+    code, = struct.unpack_from(">B", section, offset)
+    if code == 0x45:
+      count = 0
+      offset += 1
+    elif code == 0xc0:
+      count, = struct.unpack_from(">B", section, offset + 2)
+      offset += 3
+    else:
+      count, = struct.unpack_from(">I", section, offset + 5)
+      offset += 9
+    fields = []
+    for i in range(count):
+      size = self._scratch.decode(section[offset:])
+      self._scratch.clear()
+      fields.append(section[offset:offset + size])
+      offset += size
+    fields.extend([self._NULL]*(13 - len(fields)))
+    return fields
+
+  def _encode_id(self, value):
+    if value is None:
+      return self._NULL
+    if type(value) in _compat.INT_TYPES:
+      value = ulong(value)
+    scratch = self._scratch
+    scratch.clear()
+    scratch.put_object(value)
+    return scratch.encode()
+
+  def _encode_body(self, body):
+    for codec in _body_codecs(self):
+      body = codec.encode(body)
+    if self.inferred and isinstance(body, bytes):
+      code = _DATA
+    elif self.inferred and isinstance(body, (list, tuple)):
+      code = _AMQP_SEQUENCE
+    else:
+      code = _AMQP_VALUE
+    scratch = self._scratch
+    scratch.clear()
+    scratch.put_described()
+    scratch.enter()
+    scratch.put_ulong(code)
+    scratch.put_object(body)
+    scratch.exit()
+    return scratch.encode()
+
+  def encode(self, body=None, id=None, correlation_id=None, creation_time=None):
+    """
+    Returns the encoded form of a message built from the template.
+
+    @param body: the message body, omitted if None
+    @param id: the message id, omitted if None
+    @param correlation_id: the correlation-id, omitted if None
+    @param creation_time: the creation time in seconds, omitted if None
+    """
+    id = self._encode_id(id)
+    correlation_id = self._encode_id(correlation_id)
+    if creation_time is None:
+      creation_time = self._NULL
+    else:
+      creation_time = struct.pack(">Bq", 0x83, secs2millis(creation_time))
+    size = self._properties_size + len(id) + len(correlation_id) + len(creation_time)
+    parts = [self._head, struct.pack(">BII", 0xd0, size, self._properties_count),
+             id, self._before_correlation_id, correlation_id,
+             self._before_creation_time, creation_time,
+             self._after_creation_time, self._tail]
+    if body is not None:
+      parts.append(self._encode_body(body))
+    return b"".join(parts)
+
+  def send(self, sender, body=None, id=None, correlation_id=None,
+           creation_time=None, tag=None):
+    """
+    Sends a message built from the template over the given sender, in
+    the same way as L{Message.send}.
+    """
+    encoded = self.encode(body, id, correlation_id, creation_time)
+    # see proton.reactor.Compression, which works on whole messages
+    if getattr(sender, "compression", None) is not None:
+      msg = Message()
+      msg.decode(encoded)
+      return msg.send(sender, tag)
+    return sender.send_encoded(encoded, tag)
+
+class BodyCodec(object):
+  """
+  Converts message bodies to and from binary for a content type or a
+  content encoding. Codecs take effect once registered with
+  L{register_body_codec}: a message whose content type (or content
+  encoding) has a registered codec has its body encoded by the codec
+  when the message is encoded, and decoded by it when the body is
+  first accessed after the message is decoded. Where a message has
+  both, the content type codec is applied first when encoding and
+  last when decoding.
+
+  @ivar content_type: the content type handled by the codec, if any
+  @ivar content_encoding: the content encoding handled by the codec,
+  if any
+  """
+
+  content_type = None
+  content_encoding = None
+
+  def encode(self, body):
+    """
+    Returns the binary form of body, as bytes or any other object
+    supporting the buffer protocol.
+    """
+    raise NotImplementedError()
+
+  def decode(self, data):
+    """
+    Returns the body encoded in data, which may be bytes or any other
+    object supporting the buffer protocol such as a memoryview.
+    """
+    raise NotImplementedError()
+
+class JSONCodec(BodyCodec):
+  """
+  Encodes bodies as UTF-8 JSON documents.
+  """
+
+  content_type = "application/json"
+
+  def encode(self, body):
+    return json.dumps(body, separators=(",", ":")).encode("utf8")
+
+  def decode(self, data):
+    if not isinstance(data, bytes):
+      data = memoryview(data).tobytes()
+    return json.loads(data.decode("utf8"))
+
+class DeflateCodec(BodyCodec):
+  """
+  Compresses binary bodies with zlib.
+  """
+
+  content_encoding = "deflate"
+
+  def __init__(self, level=6):
+    self.level = level
+
+  def encode(self, body):
+    return zlib.compress(body, self.level)
+
+  def decode(self, data):
+    return zlib.decompress(data)
+
+class NumpyCodec(BodyCodec):
+  """
+  Encodes numpy arrays in the .npy format. Decoded arrays are read
+  only and share the memory of the binary body rather than copying
+  it. numpy is only imported when the codec is used.
+  """
+
+  content_type = "application/x-npy"
+
+  def encode(self, body):
+    import numpy
+    out = io.BytesIO()
+    numpy.save(out, body, allow_pickle=False)
+    if hasattr(out, "getbuffer"):
+      return out.getbuffer()
+    else:
+      return out.getvalue()
+
+  def decode(self, data):
+    import numpy
+    from numpy.lib import format
+    major, = struct.unpack_from(">B", data, 6)
+    if major == 1:
+      size, = struct.unpack_from("<H", data, 8)
+      offset = 10 + size
+    else:
+      size, = struct.unpack_from("<I", data, 8)
+      offset = 12 + size
+    header = io.BytesIO(memoryview(data)[:offset].tobytes())
+    version = format.read_magic(header)
+    if version == (1, 0):
+      shape, fortran_order, dtype = format.read_array_header_1_0(header)
+    else:
+      shape, fortran_order, dtype = format.read_array_header_2_0(header)
+    count = 1
+    for n in shape:
+      count *= n
+    array = numpy.frombuffer(data, dtype, count, offset)
+    return array.reshape(shape, order="F" if fortran_order else "C")
+
+def register_body_codec(codec):
+  """
+  Registers a L{BodyCodec} for its content type and/or content
+  encoding, replacing any codec previously registered for them.
+
+    >>> register_body_codec(JSONCodec())
+    >>> msg = Message(content_type="application/json", body={"key": [1, 2]})
+  """
+  if codec.content_type is not None:
+    _content_type_codecs[codec.content_type] = codec
+  if codec.content_encoding is not None:
+    _content_encoding_codecs[codec.content_encoding] = codec
+
+def unregister_body_codec(codec):
+  """
+  Removes a L{BodyCodec} registered with L{register_body_codec}.
+  """
+  if _content_type_codecs.get(codec.content_type) is codec:
+    del _content_type_codecs[codec.content_type]
+  if _content_encoding_codecs.get(codec.content_encoding) is codec:
+    del _content_encoding_codecs[codec.content_encoding]
+
+class MessagePool(object):
+  """
+  A bounded pool of L{Message} objects that can be reused rather than
+  allocated afresh for every message. Messages are cleared when they
+  are returned to the pool.
+
+    >>> pool = MessagePool()
+    >>> msg = pool.get()
+    >>> msg.decode(encoded)
+    >>> ...
+    >>> pool.put(msg)
+  """
+
+  def __init__(self, size=64, lazy=False):
+    """
+    @param size: the maximum number of idle messages kept by the pool
+    @param lazy: whether messages created by the pool decode lazily
+    """
+    self.size = size
+    self.lazy = lazy
+    self._free = []
+
+  def get(self):
+    """
+    Returns a cleared message, reusing an idle one if available.
+    """
+    if self._free:
+      return self._free.pop()
+    else:
+      return Message(lazy=self.lazy)
+
+  def put(self, msg):
+    """
+    Returns a message to the pool. The caller must not use the message
+    afterwards.
+    """
+    if len(self._free) < self.size:
+      msg.clear()
+      self._free.append(msg)
+
 class Subscription(object):
 
   def __init__(self, impl):
@@ -1309,18 +2320,96 @@ class Described(object):
 
 UNDESCRIBED = Constant("UNDESCRIBED")
 
+def _typecode(size, *codes):
+  for code in codes:
+    try:
+      if array.array(code).itemsize == size:
+        return code
+    except ValueError:
+      pass
+
+# array.array type codes and numpy dtypes of the AMQP types whose
+# elements may be held in typed Array storage
+_ARRAY_STORAGE = {
+  PN_BYTE: ("b", "int8"),
+  PN_UBYTE: ("B", "uint8"),
+  PN_SHORT: ("h", "int16"),
+  PN_USHORT: ("H", "uint16"),
+  PN_INT: (_typecode(4, "i", "l"), "int32"),
+  PN_UINT: (_typecode(4, "I", "L"), "uint32"),
+  PN_LONG: (_typecode(8, "q", "l"), "int64"),
+  PN_ULONG: (_typecode(8, "Q", "L"), "uint64"),
+  PN_FLOAT: ("f", "float32"),
+  PN_DOUBLE: ("d", "float64")
+  }
+
+def _storage_type(storage):
+  """
+  Returns the AMQP type matching the elements of typed storage, or None
+  if there is none.
+  """
+  if isinstance(storage, array.array):
+    code = storage.typecode
+    index = 0
+  else:
+    code = storage.dtype.name
+    index = 1
+  for type, codes in _compat.iteritems(_ARRAY_STORAGE):
+    if codes[index] == code:
+      return type
+  return None
+
+def _is_typed_storage(obj):
+  if isinstance(obj, array.array):
+    return True
+  # numpy is optional, and if it has not been imported there can be no
+  # ndarray to check for
+  numpy = sys.modules.get("numpy")
+  return numpy is not None and isinstance(obj, numpy.ndarray)
+
+def _typed_storage(storage, type, count=None, elements=None):
+  """
+  Creates typed storage of the given kind for the elements of an array
+  of the given AMQP type, either zero filled to hold count elements or
+  holding elements.
+  """
+  typecode, dtype = _ARRAY_STORAGE[type]
+  if storage is array.array:
+    if elements is None:
+      return array.array(typecode, b"\0" * (count * array.array(typecode).itemsize))
+    else:
+      return array.array(typecode, elements)
+  import numpy
+  if storage is not numpy.ndarray:
+    raise TypeError("unsupported array storage: %r" % storage)
+  if elements is None:
+    return numpy.zeros(count, dtype)
+  else:
+    return numpy.array(elements, dtype)
+
 class Array(object):
+  """
+  An AMQP array. The elements are normally held in a tuple, but the
+  elements of a numeric array may also be held in an C{array.array}
+  or C{numpy.ndarray} of the matching C type, which is converted to
+  and from the encoded form in bulk:
+
+    >>> Array(UNDESCRIBED, Data.DOUBLE, array.array("d", samples))
+  """
 
   def __init__(self, descriptor, type, *elements):
     self.descriptor = descriptor
     self.type = type
-    self.elements = elements
+    if len(elements) == 1 and _is_typed_storage(elements[0]):
+      self.elements = elements[0]
+    else:
+      self.elements = elements
 
   def __iter__(self):
     return iter(self.elements)
 
   def __repr__(self):
-    if self.elements:
+    if len(self.elements):
       els = ", %s"  % (", ".join(map(repr, self.elements)))
     else:
       els = ""
@@ -1329,10 +2418,30 @@ class Array(object):
   def __eq__(self, o):
     if isinstance(o, Array):
       return self.descriptor == o.descriptor and \
-          self.type == o.type and self.elements == o.elements
+          self.type == o.type and tuple(self.elements) == tuple(o.elements)
     else:
       return False
 
+# converters for described values registered with register_described,
+# keyed by descriptor
+_described_converters = {}
+# the class and encoder registered for each descriptor
+_described_classes = {}
+
+# Register the python representations of the AMQP types with the
+# native codec so that whole object trees can be converted in a single
+# call. The native codec is not available when running on proton-j.
+try:
+  pn_pycodec(ulong, timestamp, symbol, char, uuid.UUID, Described, Array,
+             UNDESCRIBED, UnmappedType, _described_converters)
+  _NATIVE_CODEC = True
+except NameError:
+  _NATIVE_CODEC = False
+
+# the native codec shares decoded strings between occurrences of the
+# same value on python 3 only
+_INTERN_STRINGS = _NATIVE_CODEC and _compat.IS_PY3
+
 class Data:
   """
   The L{Data} class provides an interface for decoding, extracting,
@@ -1788,7 +2897,8 @@ class Data:
     Puts a binary value.
 
     @type b: binary
-    @param b: a binary value
+    @param b: a binary value, or any object supporting the buffer
+    protocol such as a bytearray or memoryview
     """
     self._check(pn_data_put_binary(self._data, b))
 
@@ -2029,6 +3139,8 @@ class Data:
     If the current node is a string, returns its value, returns ""
     otherwise.
     """
+    if _INTERN_STRINGS:
+      return pn_data_get_pystring(self._data, False)
     return pn_data_get_string(self._data).decode("utf8")
 
   def get_symbol(self):
@@ -2036,6 +3148,8 @@ class Data:
     If the current node is a symbol, returns its value, returns ""
     otherwise.
     """
+    if _INTERN_STRINGS:
+      return pn_data_get_pystring(self._data, True)
     return symbol(pn_data_get_symbol(self._data).decode('ascii'))
 
   def copy(self, src):
@@ -2080,6 +3194,59 @@ class Data:
         self.exit()
       return result
 
+  def iter_items(self):
+    """
+    Returns a generator over the (key, value) pairs of the map at the
+    current node. Unlike L{get_dict}, each key and value is converted
+    to a python object only when it is reached, so a large map is
+    never held in python as a whole. The data must not be otherwise
+    navigated until the iteration is complete.
+    """
+    return self._iter_children(False, True)
+
+  def iter_sequence(self):
+    """
+    Returns a generator over the elements of the list or array at the
+    current node. Unlike L{get_sequence}, each element is converted to
+    a python object only when it is reached, so a large list is never
+    held in python as a whole. The data must not be otherwise
+    navigated until the iteration is complete.
+    """
+    described = self.type() == Data.ARRAY and pn_data_is_array_described(self._data)
+    return self._iter_children(described, False)
+
+  def _iter_columns(self):
+    # yields the key and value type of each entry of the map at the
+    # current node, leaving the value as the current node
+    if self.enter():
+      try:
+        while self.next():
+          key = self.get_object()
+          type = self.next()
+          if type is None:
+            break
+          yield key, type
+      finally:
+        self.exit()
+
+  def _iter_children(self, described, pairs):
+    if self.enter():
+      try:
+        if described:
+          self.next()
+        while self.next():
+          if pairs:
+            k = self.get_object()
+            if self.next():
+              v = self.get_object()
+            else:
+              v = None
+            yield k, v
+          else:
+            yield self.get_object()
+      finally:
+        self.exit()
+
   def put_sequence(self, s):
     self.put_list()
     self.enter()
@@ -2108,7 +3275,11 @@ class Data:
         value = self.get_object()
       finally:
         self.exit()
-      return Described(descriptor, value)
+      converter = _described_converters.get(descriptor)
+      if converter is None:
+        return Described(descriptor, value)
+      else:
+        return converter(value)
 
   def put_py_described(self, d):
     self.put_described()
@@ -2119,15 +3290,22 @@ class Data:
     finally:
       self.exit()
 
-  def get_py_array(self):
+  def get_py_array(self, storage=None):
     """
     If the current node is an array, return an Array object
     representing the array and its contents. Otherwise return None.
     This is a convenience wrapper around get_array, enter, etc.
+
+    @param storage: C{array.array} or C{numpy.ndarray} to return the
+    elements of a numeric array in typed storage of that kind rather
+    than in a tuple
     """
 
     count, described, type = self.get_array()
     if type is None: return None
+    typed = storage is not None and type in _ARRAY_STORAGE
+    if _NATIVE_CODEC and not typed:
+      return pn_data_get_pyobject(self._data)
     if self.enter():
       try:
         if described:
@@ -2136,21 +3314,37 @@ class Data:
         else:
           descriptor = UNDESCRIBED
         elements = []
-        while self.next():
-          elements.append(self.get_object())
+        if not typed or not _NATIVE_CODEC:
+          while self.next():
+            elements.append(self.get_object())
       finally:
         self.exit()
-      return Array(descriptor, type, *elements)
+      if not typed:
+        return Array(descriptor, type, *elements)
+      elif _NATIVE_CODEC:
+        elements = _typed_storage(storage, type, count=count)
+        self._check(pn_data_get_array_into(self._data, elements))
+      else:
+        elements = _typed_storage(storage, type, elements=elements)
+      return Array(descriptor, type, elements)
 
   def put_py_array(self, a):
+    if _NATIVE_CODEC:
+      self.put_object(a)
+      return
     described = a.descriptor != UNDESCRIBED
     self.put_array(described, a.type)
     self.enter()
     try:
       if described:
         self.put_object(a.descriptor)
-      for e in a.elements:
-        self.put_object(e)
+      if _is_typed_storage(a.elements):
+        put = self.put_array_mappings[a.type]
+        for e in a.elements:
+          put(self, e)
+      else:
+        for e in a.elements:
+          self.put_object(e)
     finally:
       self.exit()
 
@@ -2162,6 +3356,8 @@ class Data:
     tuple: put_sequence,
     unicode: put_string,
     bytes: put_binary,
+    bytearray: put_binary,
+    memoryview: put_binary,
     symbol: put_symbol,
     long: put_long,
     char: put_char,
@@ -2177,6 +3373,20 @@ class Data:
   if int not in put_mappings:
       put_mappings[int] = put_int
 
+  # putters for the elements of arrays held in typed storage
+  put_array_mappings = {
+    BYTE: put_byte,
+    UBYTE: put_ubyte,
+    SHORT: put_short,
+    USHORT: put_ushort,
+    INT: put_int,
+    UINT: put_uint,
+    LONG: put_long,
+    ULONG: put_ulong,
+    FLOAT: put_float,
+    DOUBLE: put_double
+    }
+
   get_mappings = {
     NULL: lambda s: None,
     BOOL: get_bool,
@@ -2207,10 +3417,37 @@ class Data:
 
 
   def put_object(self, obj):
+    """
+    Puts a python object, converting it (and any nested values) to the
+    corresponding AMQP type as described by L{put_mappings}. Where
+    available the whole tree is converted by the native codec in a
+    single call.
+    """
+    if _NATIVE_CODEC:
+      self._check(pn_data_put_pyobject(self._data, obj, self._put_mapped))
+    else:
+      self._put_mapped(obj)
+
+  def _matches(self, obj):
+    """
+    Returns True if the data holds a single value that is exactly what
+    putting obj would produce. Always returns False if the native
+    codec is unavailable.
+    """
+    return _NATIVE_CODEC and pn_data_matches_pyobject(self._data, obj)
+
+  def _put_mapped(self, obj):
     putter = self.put_mappings[obj.__class__]
     putter(self, obj)
 
   def get_object(self):
+    """
+    Returns the current node (and any nested values) as a python
+    object as described by L{get_mappings}. Where available the whole
+    tree is converted by the native codec in a single call.
+    """
+    if _NATIVE_CODEC:
+      return pn_data_get_pyobject(self._data)
     type = self.type()
     if type is None: return None
     getter = self.get_mappings.get(type)
@@ -2219,6 +3456,85 @@ class Data:
     else:
       return UnmappedType(str(type))
 
+def register_described(descriptor, cls, fields=None, encoding=Data.LIST):
+  """
+  Registers a python class for the described type with the given
+  descriptor. Described values with that descriptor are then decoded
+  straight into instances of the class rather than into L{Described},
+  and instances of the class are encoded as described values.
+
+    >>> Header = namedtuple("Header", "durable priority ttl first_acquirer delivery_count")
+    >>> register_described(ulong(0x70), Header)
+
+  The class is constructed with the values of its fields as
+  positional arguments, which suits namedtuples and classes with
+  __slots__ and a matching __init__. Fields missing from a decoded
+  value are None and any extra elements are ignored.
+
+  @param descriptor: the descriptor, a L{symbol} or L{ulong} code
+  @param cls: the class to convert to and from
+  @param fields: the names of the fields of the class in encoded order,
+  by default the _fields of a namedtuple or else the __slots__ of cls
+  @param encoding: L{Data.LIST} for a described list holding the
+  field values, or L{Data.MAP} for a described map keyed by symbols
+  of the field names
+  """
+  unregister_described(descriptor)
+  if fields is None:
+    fields = getattr(cls, "_fields", None) or cls.__slots__
+  fields = tuple(fields)
+  count = len(fields)
+  keys = [symbol(f) for f in fields]
+  if count == 1:
+    getter = lambda obj: (getattr(obj, fields[0]),)
+  else:
+    getter = operator.attrgetter(*fields)
+
+  if encoding == Data.LIST:
+    def decode(value):
+      if not isinstance(value, list):
+        return Described(descriptor, value)
+      if len(value) < count:
+        value = value + [None]*(count - len(value))
+      return cls(*value[:count])
+    def encode(data, obj):
+      data.put_described()
+      data.enter()
+      data.put_object(descriptor)
+      data.put_object(getter(obj))
+      data.exit()
+  elif encoding == Data.MAP:
+    def decode(value):
+      if not isinstance(value, dict):
+        return Described(descriptor, value)
+      return cls(*[value.get(f) for f in fields])
+    def encode(data, obj):
+      data.put_described()
+      data.enter()
+      data.put_object(descriptor)
+      data.put_object(dict(zip(keys, getter(obj))))
+      data.exit()
+  else:
+    raise ValueError("unsupported encoding: %s" % encoding)
+
+  _described_converters[descriptor] = decode
+  _described_classes[descriptor] = (cls, encode)
+  Data.put_mappings[cls] = encode
+
+def unregister_described(descriptor):
+  """
+  Removes the class registered with L{register_described} for the
+  given descriptor, if any. Described values with that descriptor are
+  decoded into L{Described} again and instances of the class can no
+  longer be encoded.
+
+  @param descriptor: the descriptor, a L{symbol} or L{ulong} code
+  """
+  _described_converters.pop(descriptor, None)
+  cls, encode = _described_classes.pop(descriptor, (None, None))
+  if cls is not None and Data.put_mappings.get(cls) is encode:
+    del Data.put_mappings[cls]
+
 class ConnectionException(ProtonException):
   pass
 
@@ -2377,12 +3693,16 @@ class Connection(Wrapper, Endpoint):
   A representation of an AMQP connection
   """
 
+  _shared = True
+
   @staticmethod
   def wrap(impl):
     if impl is None:
       return None
-    else:
-      return Connection(impl)
+    connection = live_wrapper(impl)
+    if connection is None:
+      connection = Connection(impl)
+    return connection
 
   def __init__(self, impl = pn_connection):
     Wrapper.__init__(self, impl, pn_connection_attachments)
@@ -2546,12 +3866,16 @@ class SessionException(ProtonException):
 
 class Session(Wrapper, Endpoint):
 
+  _shared = True
+
   @staticmethod
   def wrap(impl):
     if impl is None:
       return None
-    else:
-      return Session(impl)
+    session = live_wrapper(impl)
+    if session is None:
+      session = Session(impl)
+    return session
 
   def __init__(self, impl):
     Wrapper.__init__(self, impl, pn_session_attachments)
@@ -2625,6 +3949,8 @@ class Link(Wrapper, Endpoint):
   implementations, Sender and Receiver.
   """
 
+  _shared = True
+
   SND_UNSETTLED = PN_SND_UNSETTLED
   SND_SETTLED = PN_SND_SETTLED
   SND_MIXED = PN_SND_MIXED
@@ -2635,6 +3961,9 @@ class Link(Wrapper, Endpoint):
   @staticmethod
   def wrap(impl):
     if impl is None: return None
+    link = live_wrapper(impl)
+    if link is not None:
+      return link
     if pn_link_is_sender(impl):
       return Sender(impl)
     else:
@@ -2932,6 +4261,143 @@ class Sender(Link):
       # treat object as bytes
       return self.stream(obj)
 
+  def send_encoded(self, encoded, tag=None):
+    """
+    Sends an already encoded message over this sender, creating a
+    delivery for it. This allows a message that goes to many links
+    to be encoded just once:
+
+      >>> encoded = msg.encode()
+      >>> for sender in subscribers:
+      ...   sender.send_encoded(encoded)
+
+    The bytes are sent as they are, so link options that rewrite
+    messages, such as compression, do not apply.
+
+    @param encoded: the encoded message, as bytes or any other object
+    supporting the buffer protocol
+    @param tag: the delivery tag, generated with L{delivery_tag} if None
+    @return: the delivery created
+    """
+    if self.streaming:
+      raise LinkException("a delivery is already being streamed")
+    dlv = self.delivery(tag or self.delivery_tag())
+    self.stream(encoded)
+    self.advance()
+    if self.snd_settle_mode == Link.SND_SETTLED:
+      dlv.settle()
+    return dlv
+
+  def stream_from(self, source, tag=None, chunk_size=65536, high_water=None):
+    """
+    Streams the bytes of a single delivery from a file, or anything
+    else with a read method, or from an iterator of byte strings,
+    without holding all of them in memory. Chunks are only written
+    while the session buffers fewer than high_water bytes that the
+    transport has yet to frame; the remainder is written by later calls
+    to L{resume_stream}, which a MessagingHandler makes each time the
+    link is flowed, as it is whenever the transport frames a transfer.
+    The delivery is advanced once the source is exhausted. No other
+    delivery may be sent on the link until then.
+
+    A non-blocking source may have no data ready, which it signals by
+    returning (or, for an iterator, yielding) None. Streaming then
+    stops until L{resume_stream} is called again, which the
+    application must do once the source has more data.
+
+    @param source: a file-like object or an iterator of byte strings
+    @param tag: the delivery tag, generated with L{delivery_tag} if None
+    @param chunk_size: the number of bytes read from a file at a time
+    @param high_water: the number of buffered bytes above which no
+    more chunks are written, by default four chunks
+    @return: the delivery created
+    """
+    if self.streaming:
+      raise LinkException("a delivery is already being streamed")
+    if hasattr(source, "readinto"):
+      # the engine copies what is sent, so one buffer serves every read
+      buf = bytearray(chunk_size)
+      view = memoryview(buf)
+      chunks = (None if n is None else view[:n]
+                for n in iter(lambda: source.readinto(buf), 0))
+    elif hasattr(source, "read"):
+      chunks = iter(lambda: source.read(chunk_size), b"")
+    else:
+      chunks = iter(source)
+    if high_water is None:
+      high_water = 4*chunk_size
+    dlv = self.delivery(tag or self.delivery_tag())
+    self._stream = (dlv, chunks, high_water)
+    self.resume_stream()
+    return dlv
+
+  @property
+  def streaming(self):
+    """
+    True while a delivery started with L{stream_from} is incomplete.
+    """
+    return getattr(self, "_stream", None) is not None
+
+  def resume_stream(self):
+    """
+    Writes more of the delivery started with L{stream_from}, as far as
+    the session's buffer allows.
+
+    @return: True once the whole delivery has been written
+    """
+    stream = getattr(self, "_stream", None)
+    if stream is None:
+      return True
+    dlv, chunks, high_water = stream
+    session = pn_link_session(self._impl)
+    while pn_session_outgoing_bytes(session) < high_water:
+      try:
+        chunk = next(chunks)
+      except StopIteration:
+        self._stream = None
+        self.advance()
+        if self.snd_settle_mode == Link.SND_SETTLED:
+          dlv.settle()
+        return True
+      if chunk is None:
+        # the source has no data ready yet
+        return False
+      self.stream(chunk)
+    return False
+
+  def send_many(self, messages, tags=None):
+    """
+    Sends as many of the given messages as the link has credit for,
+    creating a delivery for each. The messages are encoded into a
+    single buffer, and their deliveries are created, streamed and
+    advanced in one call into the engine. Where the link is
+    pre-settled the deliveries are then settled.
+
+    @type messages: sequence of Message
+    @param messages: the messages to send
+    @param tags: the delivery tags of the messages, generated with
+    L{delivery_tag} if None
+    @return: a list of the deliveries created, which is shorter than
+    messages if the credit ran out
+    """
+    if self.streaming:
+      raise LinkException("a delivery is already being streamed")
+    messages = list(itertools.islice(messages, max(self.credit, 0)))
+    if tags is None:
+      tags = [self.delivery_tag() for _ in messages]
+    else:
+      tags = list(itertools.islice(tags, len(messages)))
+    # see proton.reactor.Compression
+    compression = getattr(self, "compression", None)
+    encode = compression.encode if compression is not None else None
+    buf, sizes = Message._encode_batch(messages, encode)
+    deliveries = [Delivery.wrap(impl) for impl in
+                  pn_link_send_batch(self._impl, buf, sizes, tags)]
+    if self.snd_settle_mode == Link.SND_SETTLED:
+      for dlv in deliveries:
+        dlv.settle()
+    return deliveries
+
   def delivery_tag(self):
     if not hasattr(self, 'tag_generator'):
       def simple_tags():
@@ -2959,6 +4425,85 @@ class Receiver(Link):
       self._check(n)
       return binary
 
+  def recv_into(self, buffer):
+    """
+    Receives up to len(buffer) bytes of the current delivery into a
+    writable buffer such as a bytearray or memoryview, without
+    allocating a new bytes object for them.
+
+    @param buffer: the writable buffer to receive into
+    @return: the number of bytes received, 0 at the end of the delivery
+    """
+    n = pn_link_recv_into(self._impl, buffer)
+    if n == PN_EOS:
+      return 0
+    return self._check(n)
+
+  def stream_to(self, target, chunk_size=65536):
+    """
+    Writes the bytes of the current delivery that have arrived so far,
+    which for a partial delivery need not be all of them, to a file or
+    any other object with a write method. This allows a large delivery
+    to be consumed as it arrives. The bytes are passed to write through
+    a buffer kept with the link, so they must be copied rather than
+    kept.
+
+    @param target: the file-like object to write to
+    @param chunk_size: the most bytes written at a time
+    @return: the number of bytes written
+    """
+    view = self._scratch(chunk_size)
+    count = 0
+    while True:
+      n = self.recv_into(view)
+      if not n:
+        return count
+      target.write(view[:n])
+      count += n
+
+  def _scratch(self, size):
+    """
+    Returns a writable memoryview of size bytes over a buffer kept with
+    the link for reuse, growing the buffer if it is too small. Buffers
+    larger than L{Message.MAX_POOLED_BUFFER_SIZE} are not kept, so a
+    single large delivery does not pin its size for the life of the
+    link.
+    """
+    attrs = self._attrs
+    buf = attrs.get("_recv_buffer")
+    if buf is None or len(buf) < size:
+      buf = bytearray(size)
+      if size <= Message.MAX_POOLED_BUFFER_SIZE:
+        attrs["_recv_buffer"] = buf
+    return memoryview(buf)[:size]
+
+  def recv_many(self, max_count=None, decode=False, messages=None):
+    """
+    Receives the complete deliveries at the head of the link, up to
+    max_count of them, advancing past each. Their bytes are read in
+    one call into the engine. The deliveries are left unsettled.
+
+    @param max_count: the most deliveries to receive, or None for all
+    the complete deliveries available
+    @param decode: whether to decode the deliveries into messages
+    @param messages: optional messages to decode into, for instance
+    from a L{MessagePool}, which implies decode
+    @return: a list of (delivery, payload) pairs where the payload is
+    either the bytes of the delivery or the decoded L{Message}
+    """
+    limit = -1 if max_count is None else max_count
+    batch = pn_link_recv_batch(self._impl, limit)
+    deliveries = [Delivery.wrap(impl) for impl, _ in batch]
+    if not (decode or messages is not None):
+      return [(dlv, payload) for dlv, (_, payload) in zip(deliveries, batch)]
+    decoded = Message.decode_many([payload for _, payload in batch], messages)
+    # see proton.reactor.Compression
+    compression = getattr(self, "compression", None)
+    if compression is not None:
+      for msg in decoded:
+        compression.decode(msg)
+    return list(zip(deliveries, decoded))
+
   def drain(self, n):
     pn_link_drain(self._impl, n)
 
@@ -3074,6 +4619,8 @@ class Delivery(Wrapper):
   Tracks and/or records the delivery of a message over a link.
   """
 
+  _shared = True
+
   RECEIVED = Disposition.RECEIVED
   ACCEPTED = Disposition.ACCEPTED
   REJECTED = Disposition.REJECTED
@@ -3084,8 +4631,10 @@ class Delivery(Wrapper):
   def wrap(impl):
     if impl is None:
       return None
-    else:
-      return Delivery(impl)
+    delivery = live_wrapper(impl)
+    if delivery is None:
+      delivery = Delivery(impl)
+    return delivery
 
   def __init__(self, impl):
     Wrapper.__init__(self, impl, pn_delivery_attachments)
@@ -3206,6 +4755,8 @@ class TraceAdapter:
 
 class Transport(Wrapper):
 
+  _shared = True
+
   TRACE_OFF = PN_TRACE_OFF
   TRACE_DRV = PN_TRACE_DRV
   TRACE_FRM = PN_TRACE_FRM
@@ -3218,8 +4769,10 @@ class Transport(Wrapper):
   def wrap(impl):
     if impl is None:
       return None
-    else:
-      return Transport(_impl=impl)
+    transport = live_wrapper(impl)
+    if transport is None:
+      transport = Transport(_impl=impl)
+    return transport
 
   def __init__(self, mode=None, _impl = pn_transport):
     Wrapper.__init__(self, _impl, pn_transport_attachments)
@@ -3306,6 +4859,19 @@ A callback for trace logging. The callback is passed the transport and log messa
     if n != len(binary):
       raise OverflowError("unable to process all bytes: %s, %s" % (n, len(binary)))
 
+  def push_from(self, buffer):
+    """
+    Pushes as many bytes from the start of a buffer as the transport
+    has capacity for. Unlike L{push} this accepts a partial push, so
+    the remainder of a bytearray or memoryview that has been read from
+    a socket can be pushed later without copying.
+
+    @param buffer: the input bytes, as any object supporting the
+    buffer protocol
+    @return: the number of bytes pushed
+    """
+    return self._check(pn_transport_push(self._impl, buffer))
+
   def close_tail(self):
     self._check(pn_transport_close_tail(self._impl))
 
@@ -3324,6 +4890,36 @@ A callback for trace logging. The callback is passed the transport and log messa
       self._check(cd)
       return out
 
+  def peek_into(self, buffer):
+    """
+    Copies pending output into a writable buffer, such as a bytearray
+    or memoryview, without popping it. Returns the number of bytes
+    copied, or None once the head of the transport is closed.
+    """
+    cd = pn_transport_peek_into(self._impl, buffer)
+    if cd == PN_EOS:
+      return None
+    else:
+      return self._check(cd)
+
+  def output_view(self):
+    """
+    Returns a read-only memoryview of all the pending output of the
+    transport, or None once its head is closed. The view is not a
+    copy but refers to the output buffer of the transport, so it can
+    be passed straight to socket.send, followed by a L{pop} of the
+    bytes that were sent:
+
+      >>> transport.pop(sock.send(transport.output_view()))
+
+    The view must not be used after the next call that pops or
+    generates output, which may move or free the memory it refers to.
+    """
+    if self.pending() == PN_EOS:
+      return None
+    else:
+      return pn_transport_output_view(self._impl)
+
   def pop(self, size):
     pn_transport_pop(self._impl, size)
 
@@ -3696,6 +5292,23 @@ DELEGATED = Constant("DELEGATED")
 def _core(number, method):
   return EventType(number=number, method=method)
 
+class _EventContext(object):
+  """
+  Like a read-only property, but the object associated with the event
+  is only wrapped on first access and then kept by the event, so that
+  handlers of the event share one wrapper.
+  """
+
+  def __init__(self, get):
+    self.get = get
+    self.__doc__ = get.__doc__
+
+  def __get__(self, obj, clazz):
+    if obj is None:
+      return self
+    ret = obj.__dict__[self.get.__name__] = self.get(obj)
+    return ret
+
 class Event(Wrapper, EventBase):
 
   REACTOR_INIT = _core(PN_REACTOR_INIT, "on_reactor_init")
@@ -3784,7 +5397,7 @@ class Event(Wrapper, EventBase):
   def root(self):
     return WrappedHandler.wrap(pn_event_root(self._impl))
 
-  @property
+  @_EventContext
   def context(self):
     """Returns the context object associated with the event. The type of this depend on the type of event."""
     return wrappers[self.clazz](pn_event_context(self._impl))
@@ -3812,22 +5425,22 @@ class Event(Wrapper, EventBase):
     else:
       return super(Event, self).__getattr__(name)
 
-  @property
+  @_EventContext
   def transport(self):
     """Returns the transport associated with the event, or null if none is associated with it."""
     return Transport.wrap(pn_event_transport(self._impl))
 
-  @property
+  @_EventContext
   def connection(self):
     """Returns the connection associated with the event, or null if none is associated with it."""
     return Connection.wrap(pn_event_connection(self._impl))
 
-  @property
+  @_EventContext
   def session(self):
     """Returns the session associated with the event, or null if none is associated with it."""
     return Session.wrap(pn_event_session(self._impl))
 
-  @property
+  @_EventContext
   def link(self):
     """Returns the link associated with the event, or null if none is associated with it."""
     return Link.wrap(pn_event_link(self._impl))
@@ -3855,7 +5468,7 @@ class Event(Wrapper, EventBase):
     else:
       return None
 
-  @property
+  @_EventContext
   def delivery(self):
     """Returns the delivery associated with the event, or null if none is associated with it."""
     return Delivery.wrap(pn_event_delivery(self._impl))
@@ -4093,10 +5706,12 @@ __all__ = [
            "SETTLED",
            "UNDESCRIBED",
            "Array",
+           "BodyCodec",
            "Collector",
            "Condition",
            "Connection",
            "Data",
+           "DeflateCodec",
            "Delivery",
            "Disposition",
            "Described",
@@ -4104,11 +5719,15 @@ __all__ = [
            "Event",
            "EventType",
            "Handler",
+           "JSONCodec",
            "Link",
            "Message",
            "MessageException",
+           "MessagePool",
+           "MessageTemplate",
            "Messenger",
            "MessengerException",
+           "NumpyCodec",
            "ProtonException",
            "VERSION_MAJOR",
            "VERSION_MINOR",
@@ -4130,7 +5749,11 @@ __all__ = [
            "Url",
            "char",
            "dispatch",
+           "register_body_codec",
+           "register_described",
            "symbol",
            "timestamp",
-           "ulong"
+           "ulong",
+           "unregister_body_codec",
+           "unregister_described"
            ]
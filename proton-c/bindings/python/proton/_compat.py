@@ -57,6 +57,10 @@ if IS_PY3:
     def str2unicode(s):
         return s
 
+    def buffer_slice(buf, size):
+        """Returns a zero-copy view of the first size bytes of buf"""
+        return memoryview(buf)[:size]
+
 else:
     INT_TYPES = (int, long)
     TEXT_TYPES = (unicode,)
@@ -82,3 +86,6 @@ else:
 
     def str2unicode(s):
         return unicode(s, "unicode_escape")
+
+    def buffer_slice(buf, size):
+        return buffer(buf, 0, size)
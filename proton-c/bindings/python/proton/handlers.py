@@ -16,11 +16,11 @@
 # specific language governing permissions and limitations
 # under the License.
 #
-import heapq, logging, os, re, socket, time, types
+import heapq, itertools, logging, os, re, socket, time, types
 
 from proton import dispatch, generate_uuid, PN_ACCEPTED, SASL, symbol, ulong, Url
 from proton import Collector, Connection, Delivery, Described, Endpoint, Event, Link, Terminus, Timeout
-from proton import Message, Handler, ProtonException, Transport, TransportException, ConnectionException
+from proton import Message, MessagePool, Handler, ProtonException, Transport, TransportException, ConnectionException
 from select import select
 
 
@@ -34,7 +34,12 @@ class OutgoingMessageHandler(Handler):
         self.delegate = delegate
 
     def on_link_flow(self, event):
-        if event.link.is_sender and event.link.credit:
+        link = event.link
+        # every transfer the transport frames flows the link, so the
+        # stream is resumed as its buffered bytes are taken
+        if link.is_sender and link.streaming and not link.resume_stream():
+            return
+        if link.is_sender and link.credit:
             self.on_sendable(event)
 
     def on_delivery(self, event):
@@ -91,10 +96,17 @@ class OutgoingMessageHandler(Handler):
         if self.delegate != None:
             dispatch(self.delegate, 'on_settled', event)
 
-def recv_msg(delivery):
-    msg = Message()
-    msg.decode(delivery.link.recv(delivery.pending))
-    delivery.link.advance()
+def recv_msg(delivery, msg=None):
+    if msg is None:
+        msg = Message()
+    link = delivery.link
+    encoded = link._scratch(delivery.pending)
+    msg.decode(encoded[:link.recv_into(encoded)])
+    link.advance()
+    # see proton.reactor.Compression
+    compression = getattr(link, "compression", None)
+    if compression is not None:
+        compression.decode(msg)
     return msg
 
 class Reject(ProtonException):
@@ -144,35 +156,117 @@ class IncomingMessageHandler(Handler, Acking):
     """
     A utility for simpler and more intuitive handling of delivery
     events related to incoming i.e. received messages.
+
+    If reuse_messages is True, received messages are taken from and
+    returned to a L{MessagePool} rather than allocated for each
+    delivery. The message on the event is then only valid for the
+    duration of the on_message callback and must not be retained.
+
+    If the delegate defines on_messages(event, batch), all the complete
+    deliveries on a link are received together and passed to it as a
+    list of (delivery, message) pairs in place of calls to on_message.
+    With auto_accept the whole batch is accepted once it returns, or
+    rejected or released if it raises L{Reject} or L{Release}.
+
+    If the delegate defines on_delivery_chunk(event), a delivery that
+    arrives in several transfers is not assembled into a message but
+    passed to it each time more of its bytes arrive, to be consumed
+    with L{Receiver.stream_to}. The last call is made once the
+    delivery is no longer partial, after which the delivery is handled
+    as for on_message.
     """
 
-    def __init__(self, auto_accept=True, delegate=None):
+    def __init__(self, auto_accept=True, delegate=None, reuse_messages=False):
         self.delegate = delegate
         self.auto_accept = auto_accept
+        if reuse_messages:
+            self.pool = MessagePool()
+        else:
+            self.pool = None
 
     def on_delivery(self, event):
         dlv = event.delivery
         if not dlv.link.is_receiver: return
-        if dlv.readable and not dlv.partial:
-            event.message = recv_msg(dlv)
-            if event.link.state & Endpoint.LOCAL_CLOSED:
+        if dlv.readable and hasattr(self.delegate, "on_delivery_chunk") and \
+                (dlv.partial or getattr(dlv, "chunked", False)):
+            self._handle_chunk(event, dlv)
+        elif dlv.readable and not dlv.partial:
+            if hasattr(self.delegate, "on_messages"):
+                self._handle_batch(event)
+                return
+            if self.pool is not None:
+                msg = recv_msg(dlv, self.pool.get())
+            else:
+                msg = recv_msg(dlv)
+            event.message = msg
+            try:
+                self._handle_message(event, dlv)
+            finally:
+                if self.pool is not None:
+                    event.message = None
+                    self.pool.put(msg)
+        elif dlv.updated and dlv.settled:
+            self.on_settled(event)
+
+    def _handle_message(self, event, dlv, callback=None):
+        if event.link.state & Endpoint.LOCAL_CLOSED:
+            if self.auto_accept:
+                dlv.update(Delivery.RELEASED)
+                dlv.settle()
+        else:
+            try:
+                (callback or self.on_message)(event)
                 if self.auto_accept:
-                    dlv.update(Delivery.RELEASED)
+                    dlv.update(Delivery.ACCEPTED)
                     dlv.settle()
+            except Reject:
+                dlv.update(Delivery.REJECTED)
+                dlv.settle()
+            except Release:
+                dlv.update(Delivery.MODIFIED)
+                dlv.settle()
+
+    def _handle_chunk(self, event, dlv):
+        dlv.chunked = True
+        if dlv.partial:
+            self.delegate.on_delivery_chunk(event)
+            return
+        if event.link.state & Endpoint.LOCAL_CLOSED:
+            event.link.advance()
+        self._handle_message(event, dlv, self._last_chunk)
+
+    def _last_chunk(self, event):
+        # once its last bytes have been read the delivery is done with
+        try:
+            self.delegate.on_delivery_chunk(event)
+        finally:
+            event.link.advance()
+
+    def _handle_batch(self, event):
+        if self.pool is not None:
+            messages = (self.pool.get() for _ in itertools.count())
+        else:
+            messages = None
+        batch = event.link.recv_many(decode=True, messages=messages)
+        try:
+            if event.link.state & Endpoint.LOCAL_CLOSED:
+                outcome = Delivery.RELEASED if self.auto_accept else None
             else:
+                outcome = Delivery.ACCEPTED if self.auto_accept else None
                 try:
-                    self.on_message(event)
-                    if self.auto_accept:
-                        dlv.update(Delivery.ACCEPTED)
-                        dlv.settle()
+                    self.delegate.on_messages(event, batch)
                 except Reject:
-                    dlv.update(Delivery.REJECTED)
-                    dlv.settle()
+                    outcome = Delivery.REJECTED
                 except Release:
-                    dlv.update(Delivery.MODIFIED)
+                    outcome = Delivery.MODIFIED
+            if outcome is not None:
+                for dlv, _ in batch:
+                    dlv.update(outcome)
                     dlv.settle()
-        elif dlv.updated and dlv.settled:
-            self.on_settled(event)
+        finally:
+            if self.pool is not None:
+                for _, msg in batch:
+                    self.pool.put(msg)
 
     def on_message(self, event):
         """
@@ -379,13 +473,21 @@ class MessagingHandler(Handler, Acking):
     A general purpose handler that makes the proton-c events somewhat
     simpler to deal with and/or avoids repetitive tasks for common use
     cases.
+
+    If reuse_messages is True, received messages are recycled once
+    on_message returns, so event.message must not be retained beyond
+    that call (see L{IncomingMessageHandler}).
+
+    A subclass that defines on_messages(event, batch) receives the
+    messages in batches instead of through on_message (see
+    L{IncomingMessageHandler}).
     """
-    def __init__(self, prefetch=10, auto_accept=True, auto_settle=True, peer_close_is_error=False):
+    def __init__(self, prefetch=10, auto_accept=True, auto_settle=True, peer_close_is_error=False, reuse_messages=False):
         self.handlers = []
         if prefetch:
             self.handlers.append(CFlowController(prefetch))
         self.handlers.append(EndpointStateHandler(peer_close_is_error, self))
-        self.handlers.append(IncomingMessageHandler(auto_accept, self))
+        self.handlers.append(IncomingMessageHandler(auto_accept, self, reuse_messages))
         self.handlers.append(OutgoingMessageHandler(auto_settle, self))
         self.fatal_conditions = ["amqp:unauthorized-access"]
 
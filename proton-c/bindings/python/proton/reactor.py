@@ -17,9 +17,9 @@ from __future__ import absolute_import
 # specific language governing permissions and limitations
 # under the License.
 #
-import logging, os, socket, time, types
+import logging, os, socket, time, types, zlib
 from heapq import heappush, heappop, nsmallest
-from proton import Collector, Connection, ConnectionException, Delivery, Described, dispatch
+from proton import Collector, Connection, ConnectionException, Data, Delivery, Described, dispatch
 from proton import Endpoint, Event, EventBase, EventType, generate_uuid, Handler, Link, Message
 from proton import ProtonException, PN_ACCEPTED, PN_PYREF, SASL, Session, SSL, SSLDomain, SSLUnavailable, symbol
 from proton import Terminus, Timeout, Transport, TransportException, ulong, Url
@@ -436,6 +436,147 @@ class Copy(ReceiverOption):
     def apply(self, receiver):
         receiver.source.distribution_mode = Terminus.DIST_MODE_COPY
 
+# the processor time of the process, for CompressionStats
+_cpu_time = getattr(time, "process_time", None) or time.clock
+
+class CompressionStats(object):
+    """
+    Counters for the work done by a L{Compression} option, across all
+    the links it is applied to. Times are in seconds of processor time.
+    """
+    def __init__(self):
+        self.compressed = 0
+        self.uncompressed_bytes = 0
+        self.compressed_bytes = 0
+        self.compress_time = 0.0
+        self.decompressed = 0
+        self.decompress_time = 0.0
+        self.decompress_failed = 0
+
+    @property
+    def ratio(self):
+        """
+        The ratio of the size of compressed bodies before and after
+        compression.
+        """
+        if self.compressed_bytes:
+            return float(self.uncompressed_bytes) / self.compressed_bytes
+        else:
+            return 1.0
+
+    def __repr__(self):
+        return "CompressionStats(compressed=%s, ratio=%.2f, compress_time=%.3f, decompressed=%s, decompress_time=%.3f, decompress_failed=%s)" % \
+            (self.compressed, self.ratio, self.compress_time, self.decompressed, self.decompress_time, self.decompress_failed)
+
+class Compression(LinkOption):
+    """
+    Compresses message bodies with zlib on sending links, and
+    decompresses them on receiving links.
+
+    A message sent on a link with this option whose body is binary,
+    either as set or as produced by a registered body codec, and at
+    least threshold bytes long is sent with its body compressed and its
+    content encoding set to "deflate". The message itself is left as it
+    was. Messages received on a link with this option that have that
+    content encoding are decompressed before they are handed to
+    on_message, with the content encoding cleared. A received body that
+    is not valid deflate data, or that would decompress to more than
+    max_size bytes, is handed to on_message as it arrived, still
+    compressed and with its content encoding intact.
+    """
+
+    CONTENT_ENCODING = "deflate"
+
+    def __init__(self, threshold=1024, level=6, max_size=64*1024*1024):
+        self.threshold = threshold
+        self.level = level
+        self.max_size = max_size
+        self.stats = CompressionStats()
+
+    def apply(self, link):
+        link.compression = self
+
+    def encode(self, msg):
+        """
+        Encodes msg for sending as L{Message.send} does, compressing its
+        body if it qualifies. Returns the scratch buffer and the encoded
+        size.
+        """
+        msg._pre_encode()
+        data = Data(pn_message_body(msg._msg))
+        data.rewind()
+        if msg.content_encoding or data.next() != Data.BINARY:
+            return msg._encode_pooled(False)
+        body = data.get_binary()
+        if len(body) < self.threshold:
+            return msg._encode_pooled(False)
+        start = _cpu_time()
+        compressed = zlib.compress(body, self.level)
+        self.stats.compress_time += _cpu_time() - start
+        if len(compressed) >= len(body):
+            return msg._encode_pooled(False)
+        self.stats.compressed += 1
+        self.stats.uncompressed_bytes += len(body)
+        self.stats.compressed_bytes += len(compressed)
+        data.clear()
+        data.put_binary(compressed)
+        pn_message_set_content_encoding(msg._msg, self.CONTENT_ENCODING)
+        try:
+            return msg._encode_pooled(False)
+        finally:
+            data.clear()
+            data.put_binary(body)
+            pn_message_set_content_encoding(msg._msg, None)
+
+    def _decompress(self, body):
+        # returns None rather than raising for bodies that are not
+        # binary, are corrupt, or would exceed max_size when expanded
+        if not isinstance(body, (bytes, bytearray, memoryview)):
+            return None
+        inflater = zlib.decompressobj()
+        try:
+            result = inflater.decompress(body, self.max_size)
+        except zlib.error:
+            return None
+        if inflater.unconsumed_tail or not getattr(inflater, "eof", True):
+            return None
+        return result
+
+    def decode(self, msg):
+        """
+        Decompresses the body of a received message if it was
+        compressed. Returns False if the body could not be
+        decompressed, in which case the message is left unchanged.
+        """
+        if msg.content_encoding != self.CONTENT_ENCODING:
+            return True
+        start = _cpu_time()
+        if "body" in msg._encoded:
+            # the body has not been converted yet (the message is lazy
+            # or has a body codec), so decompress it in place
+            data = Data(pn_message_body(msg._msg))
+            data.rewind()
+            if data.next() == Data.BINARY:
+                body = self._decompress(data.get_binary())
+                if body is None:
+                    return self._failed(start)
+                data.clear()
+                data.put_binary(body)
+        else:
+            body = self._decompress(msg.body)
+            if body is None:
+                return self._failed(start)
+            msg.body = body
+        msg.content_encoding = None
+        self.stats.decompress_time += _cpu_time() - start
+        self.stats.decompressed += 1
+        return True
+
+    def _failed(self, start):
+        self.stats.decompress_time += _cpu_time() - start
+        self.stats.decompress_failed += 1
+        return False
+
 def _apply_link_options(options, link):
     if options:
         if isinstance(options, list):
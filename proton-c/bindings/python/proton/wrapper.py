@@ -17,6 +17,7 @@
 # under the License.
 #
 from cproton import *
+import weakref
 
 class EmptyAttrs:
 
@@ -33,6 +34,10 @@ EMPTY_ATTRS = EmptyAttrs()
 
 class Wrapper(object):
 
+    # whether all uses of an engine object share one wrapper for as long
+    # as it is alive, see live_wrapper
+    _shared = False
+
     def __init__(self, impl_or_constructor, get_context=None):
         init = False
         if callable(impl_or_constructor):
@@ -60,6 +65,8 @@ class Wrapper(object):
         self.__dict__["_attrs"] = attrs
         self.__dict__["_record"] = record
         if init: self._init()
+        if self._shared and _live is not None:
+            _live[addressof(impl)] = weakref.ref(self)
 
     def __getattr__(self, name):
         attrs = self.__dict__["_attrs"]
@@ -94,6 +101,13 @@ class Wrapper(object):
         return True
 
     def __del__(self):
+        if self._shared and _live is not None:
+            key = addressof(self._impl)
+            ref = _live.get(key)
+            if ref is not None:
+                live = ref()
+                if live is self or live is None:
+                    del _live[key]
         pn_decref(self._impl)
 
     def __repr__(self):
@@ -106,6 +120,25 @@ if pn_py2void(Wrapper) is Wrapper:
     PYCTX = Wrapper
     import java.lang.System
     addressof = java.lang.System.identityHashCode
+    # identity hash codes are not unique, so wrappers are not shared
+    _live = None
 else:
     PYCTX = int(pn_py2void(Wrapper))
     addressof = int
+    # weak references to the live shared wrappers, by the address of
+    # their engine object; a wrapper removes its entry when it is deleted
+    _live = {}
+
+def live_wrapper(impl):
+    """
+    Returns the live wrapper of an engine object whose wrapper class is
+    shared, or None if there is none. Each wrapper holds a reference to
+    its engine object, so the address of an object with a live wrapper
+    cannot be reused. Wrappers are only held weakly: a strong reference
+    would keep the engine object from ever being finalized.
+    """
+    if _live is not None:
+        ref = _live.get(addressof(impl))
+        if ref is not None:
+            return ref()
+    return None
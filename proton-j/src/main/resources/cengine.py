@@ -662,6 +662,23 @@ def pn_link_unsettled(link):
 def pn_link_send(link, bytes):
   return link.impl.send(array(bytes, 'b'), 0, len(bytes))
 
+def pn_link_send_batch(link, buf, sizes, tags):
+  if len(sizes) != len(tags):
+    raise ValueError("sizes and tags differ in length")
+  for tag in tags:
+    if not isinstance(tag, (str, unicode)):
+      raise TypeError("delivery tags must be bytes or text")
+  if min(sizes or [0]) < 0 or sum(sizes) > len(buf):
+    raise ValueError("sizes exceed the buffer")
+  deliveries = []
+  offset = 0
+  for size, tag in zip(sizes, tags):
+    deliveries.append(pn_delivery(link, tag))
+    pn_link_send(link, bytes(buf[offset:offset + size]))
+    pn_link_advance(link)
+    offset += size
+  return deliveries
+
 def pn_link_recv(link, limit):
   ary = zeros(limit, 'b')
   n = link.impl.recv(ary, 0, limit)
@@ -671,6 +688,23 @@ def pn_link_recv(link, limit):
     bytes = None
   return n, bytes
 
+def pn_link_recv_into(link, buf):
+  n, bytes = pn_link_recv(link, len(buf))
+  if n > 0:
+    buf[:n] = bytes
+  return n
+
+def pn_link_recv_batch(link, limit):
+  batch = []
+  while limit < 0 or len(batch) < limit:
+    dlv = pn_link_current(link)
+    if dlv is None or not pn_delivery_readable(dlv) or pn_delivery_partial(dlv):
+      break
+    n, bytes = pn_link_recv(link, pn_delivery_pending(dlv))
+    pn_link_advance(link)
+    batch.append((dlv, bytes or ""))
+  return batch
+
 def pn_link_advance(link):
   return link.impl.advance()
 
@@ -949,6 +983,14 @@ def pn_transport_peek(trans, size):
     bb.position(0)
   return 0, ba.tostring()
 
+def pn_transport_peek_into(trans, buf):
+  cd, out = pn_transport_peek(trans, len(buf))
+  buf[:len(out)] = out
+  return len(out)
+
+def pn_transport_output_view(trans):
+  return pn_transport_peek(trans, trans.impl.pending())[1]
+
 def pn_transport_pop(trans, size):
   trans.impl.pop(size)
 
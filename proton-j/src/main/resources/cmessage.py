@@ -246,5 +246,20 @@ def pn_message_encode(msg, size):
   except BufferOverflowException, e:
     return PN_OVERFLOW, None
 
+def pn_message_encode_into(msg, buf):
+  cd, enc = pn_message_encode(msg, len(buf))
+  if cd >= 0:
+    buf[:cd] = enc
+  return cd
+
+def pn_message_encoded_size(msg):
+  size = 1024
+  while True:
+    cd, enc = pn_message_encode(msg, size)
+    if cd == PN_OVERFLOW:
+      size *= 2
+    else:
+      return cd
+
 def pn_message_clear(msg):
   msg.impl.clear()
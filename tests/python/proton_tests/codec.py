@@ -17,7 +17,7 @@
 # under the License.
 #
 
-import os, sys
+import array, os, sys
 from . import common
 from proton import *
 from proton._compat import raise_, str2unicode, unichar, str2bin
@@ -351,6 +351,154 @@ class DataTest(Test):
     copy = data.get_object()
     assert copy == obj, (copy, obj)
 
+  def testPutObjectFallback(self):
+    class Point(object):
+      def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+    class PointData(Data):
+      put_mappings = dict(Data.put_mappings)
+      put_mappings[Point] = lambda s, p: s.put_py_described(Described(symbol("point"), [p.x, p.y]))
+
+    data = PointData()
+    data.put_object({str2unicode("origin"): Point(0, 0), str2unicode("points"): [Point(1, 2)]})
+    data.rewind()
+    assert data.next()
+    copy = data.get_object()
+    assert copy == {str2unicode("origin"): Described(symbol("point"), [0, 0]),
+                    str2unicode("points"): [Described(symbol("point"), [1, 2])]}, copy
+
+  def testPutObjectUnmapped(self):
+    class Unmapped(object):
+      pass
+    try:
+      self.data.put_object([1, Unmapped()])
+      assert False, "expected KeyError"
+    except KeyError:
+      pass
+
+  def testNestedRoundTrip(self):
+    obj = [{symbol("k%s" % i): [ulong(i), Array(UNDESCRIBED, Data.LONG, i, i+1),
+                                Described(ulong(i), {str2unicode("v"): char("v")})]}
+           for i in range(10)]
+    self.data.put_object(obj)
+    data = Data()
+    data.decode(self.data.encode())
+    data.rewind()
+    assert data.next() == Data.LIST
+    copy = data.get_object()
+    assert copy == obj, (copy, obj)
+
+  def testBufferRoundTrip(self):
+    self.data.put_binary(memoryview(str2bin("xbinary"))[1:])
+    self.data.put_object(bytearray(str2bin("bytes")))
+    encoded = bytearray(self.data.encode())
+    data = Data()
+    size = data.decode(encoded)
+    data.decode(memoryview(encoded)[size:])
+    data.rewind()
+    assert data.next() == Data.BINARY
+    assert data.get_binary() == str2bin("binary")
+    assert data.next() == Data.BINARY
+    assert data.get_binary() == str2bin("bytes")
+
+  def testTypedArray(self):
+    for type, code in [(Data.BYTE, "b"), (Data.UBYTE, "B"), (Data.SHORT, "h"),
+                       (Data.USHORT, "H"), (Data.INT, "i"), (Data.UINT, "I"),
+                       (Data.FLOAT, "f"), (Data.DOUBLE, "d")]:
+      self.data.clear()
+      obj = Array(symbol("descriptor"), type, array.array(code, [1, 2, 3]))
+      self.data.put_object(obj)
+      data = Data()
+      data.decode(self.data.encode())
+      data.rewind()
+      assert data.next() == Data.ARRAY
+      copy = data.get_py_array(array.array)
+      assert copy == obj, (copy, obj)
+      assert copy.elements.typecode == code, copy.elements.typecode
+      copy = data.get_py_array()
+      assert copy == obj, (copy, obj)
+      assert copy.elements == (1, 2, 3), copy.elements
+
+  def testNumpyArray(self):
+    try:
+      import numpy
+    except ImportError:
+      raise common.Skipped("numpy is not installed")
+    obj = Array(UNDESCRIBED, Data.LONG, numpy.arange(1000, dtype="int64"))
+    self.data.put_object(obj)
+    self.data.rewind()
+    assert self.data.next() == Data.ARRAY
+    copy = self.data.get_py_array(numpy.ndarray)
+    assert isinstance(copy.elements, numpy.ndarray)
+    assert (copy.elements == obj.elements).all()
+
+  def testIterSequence(self):
+    self.data.put_object([1, "two", [3]])
+    self.data.put_object(Array(symbol("descriptor"), Data.INT, 1, 2))
+    self.data.put_object({"one": 1, "two": [2]})
+    self.data.rewind()
+    assert self.data.next() == Data.LIST
+    assert list(self.data.iter_sequence()) == [1, "two", [3]]
+    assert self.data.next() == Data.ARRAY
+    assert list(self.data.iter_sequence()) == [1, 2]
+    assert self.data.next() == Data.MAP
+    assert dict(self.data.iter_items()) == {"one": 1, "two": [2]}
+    assert self.data.next() is None
+
+  def testSharedStrings(self):
+    self.data.put_object({symbol("x-opt-key"): str2unicode("value")})
+    data = Data()
+    data.decode(self.data.encode())
+    data.rewind()
+    data.next()
+    first = data.get_object()
+    second = data.get_object()
+    assert first == second, (first, second)
+    (k1, v1), = first.items()
+    (k2, v2), = second.items()
+    assert isinstance(k1, symbol), type(k1)
+    if sys.version_info[0] >= 3:
+      assert k1 is k2
+      assert v1 is v2
+
+  def testRegisterDescribed(self):
+    from collections import namedtuple
+    Point = namedtuple("Point", "x y z")
+    class Pair(object):
+      __slots__ = ("first", "second")
+      def __init__(self, first, second):
+        self.first = first
+        self.second = second
+    register_described(symbol("test:point"), Point)
+    register_described(ulong(0x12345678), Pair, encoding=Data.MAP)
+    try:
+      self.data.put_object([Point(1, 2, 3), Pair("one", [2])])
+      self.data.put_object(Described(symbol("test:point"), [1]))
+      encoded = self.data.encode()
+      data = Data()
+      size = data.decode(encoded)
+      data.decode(encoded[size:])
+      data.rewind()
+      data.next()
+      point, pair = data.get_object()
+      assert point == Point(1, 2, 3), point
+      assert isinstance(pair, Pair), pair
+      assert (pair.first, pair.second) == ("one", [2])
+      data.next()
+      assert data.get_object() == Point(1, None, None)
+    finally:
+      unregister_described(symbol("test:point"))
+      unregister_described(ulong(0x12345678))
+
+    data.rewind()
+    data.next()
+    point, pair = data.get_object()
+    assert point == Described(symbol("test:point"), [1, 2, 3]), point
+    assert isinstance(pair, Described), pair
+    assert Pair not in Data.put_mappings
+
   def testLookup(self):
     obj = {symbol("key"): str2unicode("value"),
            symbol("pi"): 3.14159,
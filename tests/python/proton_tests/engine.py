@@ -24,7 +24,8 @@ from . import common
 from time import time, sleep
 from proton import *
 from .common import pump, Skipped
-from proton.reactor import Reactor
+from proton import LinkException
+from proton.reactor import Reactor, Compression
 from proton._compat import str2bin
 
 
@@ -1003,6 +1004,211 @@ class TransferTest(Test):
         assert rd.settled
         rd.settle()
 
+  def test_send_many(self):
+    self.rcv.flow(3)
+    self.pump()
+    deliveries = self.snd.send_many([Message(body=i) for i in range(5)])
+    assert [d.tag for d in deliveries] == ["1", "2", "3"], [d.tag for d in deliveries]
+    if "java" not in sys.platform:
+      assert Delivery.wrap(deliveries[0]._impl) is deliveries[0]
+    assert self.snd.credit == 0, self.snd.credit
+    assert self.snd.send_many([Message(body=5)]) == []
+    self.pump()
+
+    bodies = []
+    msg = Message()
+    while self.rcv.current:
+      dlv = msg.recv(self.rcv)
+      bodies.append((dlv.tag, msg.body))
+    assert bodies == [("1", 0), ("2", 1), ("3", 2)], bodies
+
+    self.rcv.flow(2)
+    self.pump()
+    deliveries = self.snd.send_many(iter([Message(body="a"), Message(body="b")]),
+                                    tags=["x", str2bin("y")])
+    assert [d.tag for d in deliveries] == ["x", "y"], [d.tag for d in deliveries]
+    self.pump()
+    dlv = msg.recv(self.rcv)
+    assert (dlv.tag, msg.body) == ("x", "a"), (dlv.tag, msg.body)
+    dlv = msg.recv(self.rcv)
+    assert (dlv.tag, msg.body) == ("y", "b"), (dlv.tag, msg.body)
+
+  def test_send_many_bad_tag(self):
+    self.rcv.flow(2)
+    self.pump()
+    try:
+      self.snd.send_many([Message(body="a"), Message(body="b")], tags=["x", 2])
+      assert False, "expected a TypeError"
+    except TypeError:
+      pass
+    assert self.snd.current is None, self.snd.current
+    assert self.snd.credit == 2, self.snd.credit
+    assert self.snd.unsettled == 0, self.snd.unsettled
+
+  def test_stream_from(self):
+    import io
+    collector = Collector()
+    self.c1.collect(collector)
+    payload = str2bin("x") * 65536
+    self.rcv.flow(1)
+    self.pump()
+    dlv = self.snd.stream_from(io.BytesIO(payload), chunk_size=4096, high_water=8192)
+    assert self.snd.streaming
+    assert self.snd.session.outgoing_bytes <= 8192, self.snd.session.outgoing_bytes
+    received = []
+    for i in range(100):
+      self.pump()
+      # as a MessagingHandler does, resume the stream when the link flows
+      while collector.peek():
+        if collector.peek().type == Event.LINK_FLOW:
+          self.snd.resume_stream()
+        collector.pop()
+      while True:
+        data = self.rcv.recv(65536)
+        if not data: break
+        received.append(data)
+      if not self.snd.streaming and not self.rcv.current.partial:
+        break
+    assert not self.snd.streaming
+    assert str2bin("").join(received) == payload
+    assert self.rcv.current.tag == dlv.tag
+
+  def test_stream_from_nonblocking(self):
+    class Source:
+      # a non-blocking source that sometimes has no data ready
+      def __init__(self, reads):
+        self.reads = reads
+      def readinto(self, buf):
+        data = self.reads.pop(0)
+        if data is None:
+          return None
+        buf[:len(data)] = data
+        return len(data)
+
+    self.rcv.flow(1)
+    self.pump()
+    source = Source([str2bin("abc"), None, str2bin("def"), str2bin("")])
+    self.snd.stream_from(source, chunk_size=8)
+    assert self.snd.streaming
+    for send in (lambda: self.snd.send(Message(body="other")),
+                 lambda: self.snd.send_many([Message(body="other")])):
+      try:
+        send()
+        assert False, "expected a LinkException"
+      except LinkException:
+        pass
+    self.pump()
+    assert self.rcv.recv(16) == str2bin("abc")
+    assert self.snd.resume_stream()
+    self.pump()
+    assert self.rcv.recv(16) == str2bin("def")
+    assert not self.rcv.current.partial
+
+  def test_template_compression(self):
+    Compression().apply(self.snd)
+    self.rcv.flow(1)
+    self.pump()
+    body = str2bin("x") * 4096
+    MessageTemplate(Message(inferred=True)).send(self.snd, body=body)
+    self.pump()
+    msg = Message()
+    msg.recv(self.rcv)
+    assert msg.content_encoding == "deflate", msg.content_encoding
+    assert len(msg.body) < len(body), len(msg.body)
+
+  def test_send_encoded(self):
+    self.rcv.flow(2)
+    self.pump()
+    encoded = Message(body="multicast").encode()
+    for tag in ("a", "b"):
+      dlv = self.snd.send_encoded(memoryview(encoded), tag)
+      assert dlv.tag == tag, dlv.tag
+    self.pump()
+
+    msg = Message()
+    for tag in ("a", "b"):
+      dlv = msg.recv(self.rcv)
+      assert (dlv.tag, msg.body) == (tag, "multicast"), (dlv.tag, msg.body)
+
+  def test_recv_many(self):
+    self.rcv.flow(4)
+    self.pump()
+    self.snd.send_many([Message(body=i) for i in range(3)])
+    self.snd.delivery("partial")
+    self.snd.send(str2bin("partial"))
+    self.pump()
+
+    current = self.rcv.current
+    batch = self.rcv.recv_many(max_count=1)
+    assert [d.tag for d, _ in batch] == ["1"], batch
+    if "java" not in sys.platform:
+      assert batch[0][0] is current
+      assert Delivery.wrap(current._impl) is current
+    msg = Message()
+    msg.decode(batch[0][1])
+    assert msg.body == 0, msg.body
+
+    batch = self.rcv.recv_many(decode=True)
+    assert [(d.tag, m.body) for d, m in batch] == [("2", 1), ("3", 2)], batch
+    assert self.rcv.current.tag == "partial"
+    assert self.rcv.recv_many() == []
+
+    self.snd.advance()
+    self.pump()
+    batch = self.rcv.recv_many()
+    assert [(d.tag, p) for d, p in batch] == [("partial", str2bin("partial"))], batch
+
+  def test_recv_into(self):
+    self.rcv.flow(2)
+    self.pump()
+    self.snd.delivery("tag")
+    self.snd.send(str2bin("this is a test"))
+    self.snd.advance()
+    self.pump()
+
+    buf = bytearray(4)
+    assert self.rcv.recv_into(buf) == 4
+    assert bytes(buf) == str2bin("this")
+    view = memoryview(bytearray(32))
+    n = self.rcv.recv_into(view[8:])
+    assert n == 10, n
+    assert view[8:8+n].tobytes() == str2bin(" is a test")
+    assert self.rcv.recv_into(buf) == 0
+    self.rcv.advance()
+
+    self.snd.send_encoded(Message(body=u"hello").encode())
+    self.pump()
+    msg = Message()
+    dlv = msg.recv(self.rcv, keep_encoded=False)
+    assert msg.body == u"hello", msg.body
+    assert getattr(dlv, "encoded", None) is None
+
+  def test_stream_to(self):
+    import io
+    self.rcv.flow(2)
+    self.pump()
+    self.snd.delivery("tag")
+    self.snd.send(str2bin("this is a test"))
+    self.pump()
+    out = io.BytesIO()
+    assert self.rcv.stream_to(out, chunk_size=4) == 14
+    assert self.rcv.stream_to(out, chunk_size=4) == 0
+    self.snd.send(str2bin("!"))
+    self.snd.advance()
+    self.pump()
+    assert self.rcv.stream_to(out) == 1
+    assert out.getvalue() == str2bin("this is a test!"), out.getvalue()
+    self.rcv.advance()
+
+    # a large message is received without keeping its buffer
+    body = str2bin("x") * (Message.MAX_POOLED_BUFFER_SIZE + 1)
+    self.snd.send(Message(body=body))
+    self.pump()
+    msg = Message()
+    msg.recv(self.rcv)
+    assert msg.body == body
+    assert len(self.rcv._attrs["_recv_buffer"]) <= Message.MAX_POOLED_BUFFER_SIZE
+
 class MaxFrameTransferTest(Test):
 
   def setUp(self):
@@ -2346,6 +2552,34 @@ class EventTest(CollectorTest):
                       (Event.CONNECTION_UNBOUND, Event.SESSION_FINAL, Event.LINK_FINAL,
                        Event.SESSION_FINAL, Event.CONNECTION_FINAL))
 
+  def testWrapperIdentity(self):
+    if "java" in sys.platform:
+      raise Skipped("Unsupported API")
+    c1, c2 = self.connection()
+    c1.collect(self.collector)
+    c1.open()
+    ssn = c1.session()
+    snd = ssn.sender("sender")
+    assert snd.session is ssn
+    assert ssn.connection is c1
+    assert snd.connection.session_head(0) is ssn
+    assert c1.link_head(0) is snd
+    snd.open()
+    events = self.drain()
+    link_events = [e for e in events if e.type == Event.LINK_LOCAL_OPEN]
+    assert len(link_events) == 1
+    e = link_events[0]
+    assert e.link is snd
+    assert e.context is snd
+    assert e.session is ssn
+    assert e.connection is c1
+    # the wrapper is released along with the last reference to it
+    snd.context = "value"
+    del snd, e, events, link_events
+    gc.collect()
+    snd = c1.link_head(0)
+    assert snd.context == "value"
+
   def testConnectionINIT_FINAL(self):
     c = Connection()
     c.collect(self.collector)
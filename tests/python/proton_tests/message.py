@@ -129,3 +129,324 @@ class CodecTest(Test):
     assert self.msg.address == msg2.address, (self.msg.address, msg2.address)
     assert self.msg.subject == msg2.subject, (self.msg.subject, msg2.subject)
     assert self.msg.body == msg2.body, (self.msg.body, msg2.body)
+
+  def testLazyDecode(self):
+    self.msg.address = "address"
+    self.msg.annotations = {symbol("x-opt-hop"): 1}
+    self.msg.properties = {"key": "value"}
+    self.msg.body = {"a": [1, 2, 3]}
+    data = self.msg.encode()
+
+    msg2 = Message(lazy=True)
+    msg2.decode(data)
+    assert msg2.address == "address", msg2.address
+    assert msg2.annotations == self.msg.annotations, msg2.annotations
+    msg2.annotations[symbol("x-opt-hop")] = 2
+
+    msg3 = Message()
+    msg3.decode(msg2.encode())
+    assert msg3.annotations == {symbol("x-opt-hop"): 2}, msg3.annotations
+    assert msg3.properties == self.msg.properties, msg3.properties
+    assert msg3.body == self.msg.body, msg3.body
+
+  def testLazyOverwrite(self):
+    self.msg.body = "original"
+    msg2 = Message(lazy=True)
+    msg2.decode(self.msg.encode())
+    msg2.body = None
+    msg2.properties = {"key": "value"}
+
+    msg3 = Message()
+    msg3.decode(msg2.encode())
+    assert msg3.body is None, msg3.body
+    assert msg3.properties == {"key": "value"}, msg3.properties
+
+  def testReencodeMutated(self):
+    self.msg.properties = {"key": [1, 2, {"nested": "value"}]}
+    self.msg.body = [1, 2, 3]
+    first = self.msg.encode()
+    assert self.msg.encode() == first
+
+    self.msg.properties["key"][2]["nested"] = "changed"
+    self.msg.body[0] = True
+    msg2 = Message()
+    msg2.decode(self.msg.encode())
+    assert msg2.properties == {"key": [1, 2, {"nested": "changed"}]}, msg2.properties
+    assert msg2.body == [True, 2, 3], msg2.body
+    assert type(msg2.body[0]) is bool, msg2.body
+
+    self.msg.properties = None
+    msg2.decode(self.msg.encode())
+    assert msg2.properties is None, msg2.properties
+
+  def testEncodeInto(self):
+    self.msg.address = "address"
+    self.msg.body = str2bin("x"*100000)
+    encoded = self.msg.encode()
+    assert self.msg.encoded_size() == len(encoded), (self.msg.encoded_size(), len(encoded))
+
+    buf = bytearray(len(encoded) + 10)
+    n = self.msg.encode_into(memoryview(buf)[5:])
+    assert n == len(encoded), (n, len(encoded))
+    assert bytes(buf[5:5+n]) == encoded
+
+    try:
+      self.msg.encode_into(bytearray(16))
+      assert False, "expected an overflow"
+    except MessageException:
+      pass
+
+  def testEncodeDecodeMany(self):
+    msgs = [Message(subject="subject-%s" % i, body=i) for i in range(10)]
+    msgs.append(Message(body=str2bin("x")*4096))
+    encoded = Message.encode_many(msgs)
+    assert encoded == [m.encode() for m in msgs]
+
+    decoded = Message.decode_many(encoded)
+    assert [m.subject for m in decoded] == [m.subject for m in msgs]
+    assert [m.body for m in decoded] == [m.body for m in msgs]
+
+    reused = Message.decode_many(reversed(encoded), decoded)
+    assert reused == decoded
+    assert decoded[0].body == msgs[-1].body
+
+  def testPeekHeaders(self):
+    self.msg.address = "address"
+    self.msg.subject = "subject"
+    self.msg.priority = 7
+    self.msg.instructions = {symbol("instruction"): 1}
+    self.msg.annotations = {symbol("annotation"): 2}
+    self.msg.properties = {"key": "value"}
+    self.msg.body = str2bin("x")*65536
+    msg2 = Message.peek_headers(self.msg.encode())
+    assert msg2.address == "address", msg2.address
+    assert msg2.subject == "subject", msg2.subject
+    assert msg2.priority == 7, msg2.priority
+    assert msg2.instructions == self.msg.instructions, msg2.instructions
+    assert msg2.annotations == self.msg.annotations, msg2.annotations
+    assert msg2.properties == self.msg.properties, msg2.properties
+    assert msg2.body is None, msg2.body
+
+    msg2 = Message.peek_headers(Message(subject="subject").encode())
+    assert msg2.subject == "subject", msg2.subject
+
+  def testDecodeBuffer(self):
+    self.msg.subject = "subject"
+    self.msg.body = str2bin("x")*1024
+    encoded = bytearray(self.msg.encode())
+
+    msg2 = Message()
+    msg2.decode(memoryview(encoded))
+    assert msg2.body == self.msg.body, msg2.body
+
+    msg2.decode(encoded, copy=False)
+    assert msg2.subject == "subject", msg2.subject
+    assert isinstance(msg2.body, memoryview), type(msg2.body)
+    assert msg2.body.tobytes() == self.msg.body
+    encoded[-1:] = str2bin("y")
+    assert msg2.body.tobytes() == self.msg.body[:-1] + str2bin("y")
+    assert msg2.encode() == bytes(encoded)
+
+    self.msg.body = "text"
+    msg2.decode(self.msg.encode(), copy=False)
+    assert msg2.body == "text", msg2.body
+
+  def testIterBody(self):
+    for lazy in (False, True):
+      self.msg.body = [{"id": i} for i in range(10)]
+      msg2 = Message(lazy=lazy)
+      msg2.decode(self.msg.encode())
+      assert list(msg2.iter_body()) == self.msg.body
+
+      self.msg.body = {"key": "value"}
+      msg2.decode(self.msg.encode())
+      assert list(msg2.iter_body()) == [("key", "value")]
+
+      self.msg.body = "value"
+      msg2.decode(self.msg.encode())
+      assert list(msg2.iter_body()) == ["value"]
+
+      self.msg.body = None
+      msg2.decode(self.msg.encode())
+      assert list(msg2.iter_body()) == []
+
+  def testColumns(self):
+    import array
+    messages = [Message(body={"x": i + 0.5, "n": i, "s": "s%s" % i})
+                for i in range(4)]
+    messages[2].body["extra"] = True
+    messages[3].body["n"] = "four"
+    columns = Message.decode_columns(Message.encode_many(messages))
+    assert columns["x"] == array.array("d", [0.5, 1.5, 2.5, 3.5]), columns["x"]
+    assert columns["n"] == [0, 1, 2, "four"], columns["n"]
+    assert columns["s"] == ["s0", "s1", "s2", "s3"], columns["s"]
+    assert columns["extra"] == [None, None, True, None], columns["extra"]
+
+    columns = {"x": array.array("f", [1.0, 2.0]), "n": [1, None]}
+    encoded = Message.encode_columns(columns, section="properties",
+                                     template=Message(body="body"))
+    decoded = Message.decode_many(encoded)
+    assert [m.properties for m in decoded] == [{"x": 1.0, "n": 1}, {"x": 2.0}], decoded
+    assert decoded[0].body == "body", decoded[0].body
+    assert Message.decode_columns(encoded, section="properties", fields=["x"]) == \
+        {"x": columns["x"]}
+
+  def testPatchAnnotations(self):
+    self.msg.durable = True
+    self.msg.instructions = {symbol("instruction"): 1}
+    self.msg.properties = {"property": 2}
+    self.msg.body = str2bin("x")*1024
+    encoded = self.msg.encode()
+
+    patched = Message.patch_annotations(encoded, {symbol("x-hop"): 1})
+    msg2 = Message()
+    msg2.decode(patched)
+    assert msg2.annotations == {symbol("x-hop"): 1}, msg2.annotations
+    assert msg2.durable
+    assert msg2.instructions == self.msg.instructions, msg2.instructions
+    assert msg2.properties == self.msg.properties, msg2.properties
+    assert msg2.body == self.msg.body
+
+    buf = bytearray(patched)
+    result = Message.patch_annotations(buf, {symbol("x-hop"): None, symbol("x-ts"): 2})
+    assert result is buf
+    msg2.decode(buf)
+    assert msg2.annotations == {symbol("x-ts"): 2}, msg2.annotations
+
+    Message.patch_annotations(buf, {symbol("x-ts"): None})
+    assert bytes(buf) == encoded
+
+class BodyCodecTest(Test):
+
+  def setUp(self):
+    Test.setUp(self)
+    self.codecs = [JSONCodec(), DeflateCodec()]
+    for codec in self.codecs:
+      register_body_codec(codec)
+
+  def tearDown(self):
+    for codec in self.codecs:
+      unregister_body_codec(codec)
+    Test.tearDown(self)
+
+  def testJSON(self):
+    body = {"key": [1, 2.5, "three", None]}
+    self.msg.content_type = "application/json"
+    self.msg.body = body
+    encoded = self.msg.encode()
+
+    msg2 = Message()
+    msg2.decode(encoded)
+    assert msg2.body == body, msg2.body
+    msg2.decode(encoded, copy=False)
+    assert msg2.body == body, msg2.body
+
+    unregister_body_codec(self.codecs[0])
+    msg2.decode(encoded)
+    assert msg2.body == str2bin('{"key":[1,2.5,"three",null]}'), msg2.body
+
+  def testDeflate(self):
+    body = str2bin("x")*1024
+    self.msg.content_encoding = "deflate"
+    self.msg.body = body
+    encoded = self.msg.encode()
+    assert len(encoded) < len(body), len(encoded)
+    msg2 = Message()
+    msg2.decode(encoded)
+    assert msg2.body == body
+
+    self.msg.content_type = "application/json"
+    self.msg.body = ["value"]
+    msg2.decode(self.msg.encode())
+    assert msg2.body == ["value"], msg2.body
+
+  def testTemplate(self):
+    body = {"key": [1, 2.5, "three", None]}
+    self.msg.content_type = "application/json"
+    template = MessageTemplate(self.msg)
+    self.msg.body = body
+    encoded = template.encode(body=body, creation_time=0)
+    assert encoded == self.msg.encode()
+    msg2 = Message()
+    msg2.decode(encoded)
+    assert msg2.body == body, msg2.body
+
+  def testNumpy(self):
+    try:
+      import numpy
+    except ImportError:
+      raise common.Skipped("numpy is not installed")
+    codec = NumpyCodec()
+    self.codecs.append(codec)
+    register_body_codec(codec)
+    body = numpy.arange(12, dtype="float32").reshape((3, 4))
+    self.msg.content_type = "application/x-npy"
+    self.msg.body = body
+    msg2 = Message()
+    msg2.decode(self.msg.encode())
+    assert msg2.body.dtype == body.dtype
+    assert (msg2.body == body).all()
+
+class TemplateTest(Test):
+
+  def testEncode(self):
+    self.msg.address = "address"
+    self.msg.durable = True
+    self.msg.content_type = "text/plain"
+    self.msg.annotations = {symbol("x-opt-hop"): 1}
+    self.msg.properties = {"key": "value"}
+    template = MessageTemplate(self.msg)
+
+    self.msg.id = 17
+    self.msg.correlation_id = uuid4()
+    self.msg.creation_time = 1234.5
+    self.msg.body = "Hello World!"
+    encoded = template.encode(body=self.msg.body, id=self.msg.id,
+                              correlation_id=self.msg.correlation_id,
+                              creation_time=self.msg.creation_time)
+    assert encoded == self.msg.encode()
+
+  def testOptionalFields(self):
+    self.msg.subject = "subject"
+    self.msg.inferred = True
+    template = MessageTemplate(self.msg)
+    msg2 = Message()
+    msg2.decode(template.encode())
+    assert msg2.subject == "subject", msg2.subject
+    assert msg2.id is None, msg2.id
+    assert msg2.body is None, msg2.body
+
+    msg2.decode(template.encode(body=str2bin("binary"), id="id"))
+    assert msg2.body == str2bin("binary"), msg2.body
+    assert msg2.id == "id", msg2.id
+
+class PoolTest(Test):
+
+  def testReuse(self):
+    pool = MessagePool(size=1)
+    msg = pool.get()
+    msg.subject = "subject"
+    msg.id = 5
+    msg.body = "body"
+    pool.put(msg)
+
+    msg2 = pool.get()
+    assert msg2 is msg
+    assert msg2.subject is None, msg2.subject
+    assert msg2.id is None, msg2.id
+    assert msg2.body is None, msg2.body
+
+    other = Message()
+    pool.put(msg2)
+    pool.put(other)
+    assert pool.get() is msg2
+    assert pool.get() is not other
+
+  def testSlots(self):
+    msg = Message()
+    assert not hasattr(msg, "__dict__")
+    try:
+      msg.bogus = 1
+      assert False, "expected an AttributeError"
+    except AttributeError:
+      pass
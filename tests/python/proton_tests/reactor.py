@@ -18,11 +18,11 @@ from __future__ import absolute_import
 # under the License.
 #
 
-import time
+import io, time, zlib
 from .common import Test, SkipTest, TestServer, free_tcp_port, ensureCanTestExtendedSASL
-from proton.reactor import Container, Reactor, ApplicationEvent, EventInjector
+from proton.reactor import Container, Reactor, ApplicationEvent, EventInjector, Compression
 from proton.handlers import CHandshaker, MessagingHandler
-from proton import Handler
+from proton import Handler, Message
 
 class Barf(Exception):
     pass
@@ -539,3 +539,189 @@ class ContainerTest(Test):
         container.connect(test_handler.url, user="user@proton", password="password", reconnect=False)
         container.run()
         assert test_handler.verified
+
+    def test_reuse_messages(self):
+        class ReceiveHandler(MessagingHandler):
+            def __init__(self):
+                super(ReceiveHandler, self).__init__(reuse_messages=True)
+                self.url = "localhost:%i" % free_tcp_port()
+                self.bodies = []
+                self.messages = set()
+
+            def on_start(self, event):
+                self.listener = event.container.listen(self.url)
+
+            def on_message(self, event):
+                self.bodies.append(event.message.body)
+                self.messages.add(id(event.message))
+                if len(self.bodies) == 3:
+                    event.connection.close()
+                    self.listener.close()
+
+        class SendHandler(MessagingHandler):
+            def __init__(self):
+                super(SendHandler, self).__init__()
+                self.sent = 0
+
+            def on_sendable(self, event):
+                while event.sender.credit and self.sent < 3:
+                    event.sender.send(Message(body=self.sent))
+                    self.sent += 1
+
+            def on_connection_closing(self, event):
+                event.connection.close()
+
+        receiver = ReceiveHandler()
+        container = Container(receiver)
+        container.create_sender(receiver.url, handler=SendHandler())
+        container.run()
+        assert receiver.bodies == [0, 1, 2], receiver.bodies
+        assert len(receiver.messages) == 1, receiver.messages
+
+    def test_on_messages(self):
+        class ReceiveHandler(MessagingHandler):
+            def __init__(self):
+                super(ReceiveHandler, self).__init__(prefetch=100)
+                self.url = "localhost:%i" % free_tcp_port()
+                self.bodies = []
+                self.batches = 0
+
+            def on_start(self, event):
+                self.listener = event.container.listen(self.url)
+
+            def on_messages(self, event, batch):
+                self.batches += 1
+                self.bodies.extend(msg.body for dlv, msg in batch)
+                if len(self.bodies) == 20:
+                    event.connection.close()
+                    self.listener.close()
+
+        class SendHandler(MessagingHandler):
+            def __init__(self):
+                super(SendHandler, self).__init__()
+                self.sent = 0
+
+            def on_sendable(self, event):
+                if not self.sent:
+                    event.sender.send_many([Message(body=i) for i in range(20)])
+                    self.sent = 20
+
+            def on_connection_closing(self, event):
+                event.connection.close()
+
+        receiver = ReceiveHandler()
+        container = Container(receiver)
+        container.create_sender(receiver.url, handler=SendHandler())
+        container.run()
+        assert receiver.bodies == list(range(20)), receiver.bodies
+        assert receiver.batches < 20, receiver.batches
+
+    def test_stream(self):
+        payload = bytes(bytearray(range(256))) * 16384
+        class ReceiveHandler(MessagingHandler):
+            def __init__(self):
+                super(ReceiveHandler, self).__init__()
+                self.url = "localhost:%i" % free_tcp_port()
+                self.received = io.BytesIO()
+                self.chunks = 0
+                self.buffered = 0
+
+            def on_start(self, event):
+                self.listener = event.container.listen(self.url)
+
+            def on_delivery_chunk(self, event):
+                self.chunks += 1
+                self.buffered = max(self.buffered, event.delivery.pending)
+                event.receiver.stream_to(self.received)
+                if not event.delivery.partial:
+                    event.connection.close()
+                    self.listener.close()
+
+        class SendHandler(MessagingHandler):
+            def __init__(self):
+                super(SendHandler, self).__init__()
+                self.delivery = None
+                self.buffered = 0
+                self.accepted = False
+
+            def on_sendable(self, event):
+                if self.delivery is None:
+                    self.delivery = event.sender.stream_from(io.BytesIO(payload), chunk_size=16384)
+
+            def on_link_flow(self, event):
+                self.buffered = max(self.buffered, event.session.outgoing_bytes)
+
+            def on_accepted(self, event):
+                self.accepted = True
+
+            def on_connection_closing(self, event):
+                event.connection.close()
+
+        receiver = ReceiveHandler()
+        sender = SendHandler()
+        container = Container(receiver)
+        container.create_sender(receiver.url, handler=sender)
+        container.run()
+        assert receiver.received.getvalue() == payload
+        assert receiver.chunks > 1, receiver.chunks
+        assert sender.buffered <= 5*16384, sender.buffered
+        assert sender.accepted
+
+    def test_compression(self):
+        bodies = [b"x" * 4096, b"small"]
+        class ReceiveHandler(MessagingHandler):
+            def __init__(self):
+                super(ReceiveHandler, self).__init__()
+                self.url = "localhost:%i" % free_tcp_port()
+                self.compression = Compression()
+                self.received = []
+
+            def on_start(self, event):
+                self.listener = event.container.listen(self.url)
+
+            def on_link_opening(self, event):
+                self.compression.apply(event.link)
+
+            def on_message(self, event):
+                self.received.append((event.message.body, event.message.content_encoding))
+                if len(self.received) == len(bodies):
+                    event.connection.close()
+                    self.listener.close()
+
+        class SendHandler(MessagingHandler):
+            def __init__(self):
+                super(SendHandler, self).__init__()
+                self.sent = 0
+
+            def on_sendable(self, event):
+                while event.sender.credit and self.sent < len(bodies):
+                    msg = Message(body=bodies[self.sent])
+                    event.sender.send(msg)
+                    assert msg.body == bodies[self.sent] and msg.content_encoding is None
+                    self.sent += 1
+
+            def on_connection_closing(self, event):
+                event.connection.close()
+
+        receiver = ReceiveHandler()
+        compression = Compression(threshold=1024)
+        container = Container(receiver)
+        container.create_sender(receiver.url, handler=SendHandler(), options=compression)
+        container.run()
+        assert receiver.received == [(b, None) for b in bodies], receiver.received
+        assert compression.stats.compressed == 1, compression.stats
+        assert compression.stats.uncompressed_bytes == 4096, compression.stats
+        assert compression.stats.compressed_bytes < 4096, compression.stats
+        assert receiver.compression.stats.decompressed == 1, receiver.compression.stats
+
+    def test_decompression_errors(self):
+        compression = Compression(max_size=1024)
+        body = zlib.compress(b"x" * 1024)
+        for bad in [b"not deflate", zlib.compress(b"x" * 1025), "text"]:
+            msg = Message(body=bad, content_encoding="deflate")
+            assert not compression.decode(msg)
+            assert msg.body == bad and msg.content_encoding == "deflate"
+        assert compression.stats.decompress_failed == 3, compression.stats
+        msg = Message(body=body, content_encoding="deflate")
+        assert compression.decode(msg)
+        assert msg.body == b"x" * 1024 and msg.content_encoding is None
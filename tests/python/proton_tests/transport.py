@@ -191,6 +191,39 @@ class ClientTransportTest(Test):
     self.peer.push(dat2[len(dat1):])
     self.peer.push(dat3)
 
+  def testBufferIO(self):
+    conn = Connection()
+    conn.container = "test-container"
+    conn.open()
+    self.transport.bind(conn)
+
+    expected = self.transport.peek(1024)
+    buf = bytearray(8)
+    assert self.transport.peek_into(buf) == 8
+    assert bytes(buf) == expected[:8]
+    view = self.transport.output_view()
+    assert view.readonly
+    assert view.tobytes() == expected, (view.tobytes(), expected)
+
+    received = memoryview(bytearray(1024))
+    n = 0
+    while n < len(expected):
+      view = self.transport.output_view()
+      sent = min(len(view), 5)
+      received[n:n+sent] = view[:sent]
+      self.transport.pop(sent)
+      n += sent
+    assert self.transport.output_view().tobytes() == str2bin("")
+
+    pushed = self.peer.push_from(received[:10])
+    assert pushed == 10, pushed
+    assert self.peer.push_from(received[pushed:n]) == n - pushed
+    assert self.conn.remote_container == "test-container"
+
+    self.transport.close_head()
+    assert self.transport.output_view() is None
+    assert self.transport.peek_into(buf) is None
+
 class ServerTransportTest(Test):
 
   def setUp(self):